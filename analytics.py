@@ -0,0 +1,177 @@
+"""
+Per-exercise progression analytics.
+
+Charts are served from ExerciseWeeklyStats, one row per user, exercise and
+week holding set/rep counts, tonnage, best estimated 1RM and heaviest weight.
+record_sets() folds newly written sets into those rows with an atomic upsert in
+the same transaction as the workout, and existing history is loaded once by a
+single GROUP BY over set_log (see migrations.py). Reading five years of
+progress is therefore a few hundred small rows rather than every set ever
+logged.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import Date, and_, case, func, insert, select
+from database import dialect_insert
+from models import db, Exercise, ExerciseWeeklyStats, SetLog, WorkoutLog
+from records import rep_maxes
+
+# Rep-based 1RM estimates get unreliable past this many reps
+E1RM_MAX_REPS = 12
+DEFAULT_WEEKS = 12
+MAX_WEEKS = 260  # Longest trend a request may ask for
+
+
+def estimate_1rm(weight, reps):
+    """Epley estimated one-rep max, or None when the set says little about it"""
+    if not weight or weight <= 0 or not reps or reps > E1RM_MAX_REPS:
+        return None
+    return weight if reps == 1 else weight * (1 + reps / 30)
+
+
+def week_start(when):
+    """Monday of the week containing `when`"""
+    day = when.date() if isinstance(when, datetime) else when
+    return day - timedelta(days=day.weekday())
+
+
+def _max_of(a, b):
+    # NULL-aware greatest(), portable across SQLite and PostgreSQL
+    return case((a.is_(None), b), (b.is_(None), a), (a >= b, a), else_=b)
+
+
+def record_sets(user_id, rows):
+    """Fold new sets into the weekly aggregates; rows are (date, exercise_id, weight, reps)"""
+    totals = {}
+    for when, exercise_id, weight, reps in rows:
+        key = (exercise_id, week_start(when))
+        total = totals.setdefault(key, {'sets': 0, 'reps': 0, 'tonnage': 0.0, 'best_e1rm': None, 'best_weight': None})
+        total['sets'] += 1
+        total['reps'] += reps
+        total['tonnage'] += (weight or 0) * reps
+        e1rm = estimate_1rm(weight, reps)
+        if e1rm is not None and (total['best_e1rm'] is None or e1rm > total['best_e1rm']):
+            total['best_e1rm'] = e1rm
+        if weight is not None and (total['best_weight'] is None or weight > total['best_weight']):
+            total['best_weight'] = weight
+    if not totals:
+        return
+
+    table = ExerciseWeeklyStats.__table__
+    stmt = dialect_insert(ExerciseWeeklyStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.exercise_id, table.c.week_start],
+        set_={
+            'sets': table.c.sets + stmt.excluded.sets,
+            'reps': table.c.reps + stmt.excluded.reps,
+            'tonnage': table.c.tonnage + stmt.excluded.tonnage,
+            'best_e1rm': _max_of(table.c.best_e1rm, stmt.excluded.best_e1rm),
+            'best_weight': _max_of(table.c.best_weight, stmt.excluded.best_weight)
+        }
+    )
+    db.session.execute(stmt, [
+        dict(total, user_id=user_id, exercise_id=exercise_id, week_start=week)
+        for (exercise_id, week), total in totals.items()
+    ])
+
+
+def backfill_statement(dialect_name):
+    """INSERT ... SELECT building every user's weekly rows from set_log in one pass"""
+    if dialect_name == 'postgresql':
+        week = func.date_trunc('week', WorkoutLog.date).cast(Date)
+    else:
+        week = func.date(WorkoutLog.date, 'weekday 0', '-6 days')
+    e1rm = case(
+        (and_(SetLog.weight > 0, SetLog.reps == 1), SetLog.weight),
+        (and_(SetLog.weight > 0, SetLog.reps <= E1RM_MAX_REPS), SetLog.weight * (1 + SetLog.reps / 30.0)),
+        else_=None
+    )
+    grouped = select(
+        WorkoutLog.user_id,
+        SetLog.exercise_id,
+        week,
+        func.count(SetLog.id),
+        func.sum(SetLog.reps),
+        func.sum(func.coalesce(SetLog.weight, 0) * SetLog.reps),
+        func.max(e1rm),
+        func.max(SetLog.weight)
+    ).join(WorkoutLog, SetLog.workout_log_id == WorkoutLog.id)\
+     .group_by(WorkoutLog.user_id, SetLog.exercise_id, week)
+
+    return insert(ExerciseWeeklyStats).from_select(
+        ['user_id', 'exercise_id', 'week_start', 'sets', 'reps', 'tonnage', 'best_e1rm', 'best_weight'],
+        grouped
+    )
+
+
+def _since(weeks):
+    return week_start(datetime.utcnow()) - timedelta(weeks=weeks - 1)
+
+
+def exercise_progress(user_id, exercise, weeks=None):
+    """Weekly e1RM/tonnage trend and records for one exercise"""
+    query = ExerciseWeeklyStats.query.filter_by(user_id=user_id, exercise_id=exercise.id)
+    rows = query.order_by(ExerciseWeeklyStats.week_start).all()
+
+    records = {'best_e1rm': None, 'best_weight': None, 'best_week_tonnage': None}
+    for row in rows:
+        if row.best_e1rm is not None and (records['best_e1rm'] is None or row.best_e1rm > records['best_e1rm']['value']):
+            records['best_e1rm'] = {'value': round(row.best_e1rm, 2), 'week': row.week_start}
+        if row.best_weight is not None and (records['best_weight'] is None or row.best_weight > records['best_weight']['value']):
+            records['best_weight'] = {'value': row.best_weight, 'week': row.week_start}
+        if records['best_week_tonnage'] is None or row.tonnage > records['best_week_tonnage']['value']:
+            records['best_week_tonnage'] = {'value': round(row.tonnage, 2), 'week': row.week_start}
+
+    if weeks:
+        since = _since(weeks)
+        rows = [row for row in rows if row.week_start >= since]
+
+    return {
+        'exercise': exercise.to_dict(),
+        'weekly': [row.to_dict() for row in rows],
+        'personal_records': records,
+        'rep_maxes': [record.to_dict() for record in rep_maxes(user_id, exercise.id)]
+    }
+
+
+def weekly_volume(user_id, weeks=DEFAULT_WEEKS):
+    """Weekly tonnage per exercise and per muscle group, as week-aligned columns"""
+    since = _since(weeks)
+    week_keys = [since + timedelta(weeks=i) for i in range(weeks)]
+    position = {week: i for i, week in enumerate(week_keys)}
+
+    rows = db.session.query(ExerciseWeeklyStats.exercise_id,
+                            ExerciseWeeklyStats.week_start,
+                            ExerciseWeeklyStats.tonnage,
+                            ExerciseWeeklyStats.sets)\
+                     .filter(ExerciseWeeklyStats.user_id == user_id,
+                             ExerciseWeeklyStats.week_start >= since).all()
+
+    exercise_ids = {exercise_id for exercise_id, _, _, _ in rows}
+    exercises = {e.id: e for e in Exercise.query.filter(Exercise.id.in_(exercise_ids))} if exercise_ids else {}
+
+    per_exercise = {}
+    per_muscle = {}
+    for exercise_id, week, tonnage, sets in rows:
+        i = position.get(week)
+        if i is None:
+            continue
+        series = per_exercise.setdefault(exercise_id, {'tonnage': [0.0] * weeks, 'sets': [0] * weeks})
+        series['tonnage'][i] += tonnage
+        series['sets'][i] += sets
+        # A compound lift counts toward every muscle group it trains
+        for muscle in (exercises[exercise_id].muscle_groups or []) if exercise_id in exercises else []:
+            per_muscle.setdefault(muscle, [0.0] * weeks)[i] += tonnage
+
+    return {
+        'weeks': week_keys,
+        'exercises': [{
+            'exercise_id': exercise_id,
+            'name': exercises[exercise_id].name if exercise_id in exercises else None,
+            'tonnage': [round(t, 2) for t in series['tonnage']],
+            'sets': series['sets']
+        } for exercise_id, series in sorted(per_exercise.items())],
+        'muscle_groups': [{
+            'muscle': muscle,
+            'tonnage': [round(t, 2) for t in tonnage]
+        } for muscle, tonnage in sorted(per_muscle.items())]
+    }
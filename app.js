@@ -513,7 +513,7 @@ async function loadDashboardData() {
             updateDashboardStats(getLocalWorkoutHistory(email));
             return;
         }
-        const response = await fetch(`${API_BASE}/workouts/history?per_page=100`, {
+        const response = await fetch(`${API_BASE}/workouts/stats`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`
             }
@@ -521,7 +521,7 @@ async function loadDashboardData() {
         
         if (response.ok) {
             const data = await response.json();
-            updateDashboardStats(data.workouts);
+            renderDashboardStats(data.stats);
         }
     } catch (error) {
         console.error('Failed to load dashboard data:', error);
@@ -554,9 +554,18 @@ function updateDashboardStats(workouts) {
         }
     }
     
-    document.getElementById('total-workouts').textContent = totalWorkouts;
-    document.getElementById('week-workouts').textContent = weekWorkouts;
-    document.getElementById('workout-streak').textContent = `${streak} days`;
+    renderDashboardStats({
+        total_workouts: totalWorkouts,
+        week_workouts: weekWorkouts,
+        current_streak: streak
+    });
+}
+
+// Stats come precomputed from /workouts/stats; the local history path builds the same shape
+function renderDashboardStats(stats) {
+    document.getElementById('total-workouts').textContent = stats.total_workouts;
+    document.getElementById('week-workouts').textContent = stats.week_workouts;
+    document.getElementById('workout-streak').textContent = `${stats.current_streak} days`;
 }
 
 // Workout template functions
@@ -850,8 +859,15 @@ async function finishWorkout() {
 }
 
 // Workout history functions
+// History is fetched page by page with an opaque cursor as the user scrolls
+const HISTORY_PAGE_SIZE = 20;
+let historyCursor = null;
+let historyLoading = false;
+let historyObserver = null;
+
 async function loadWorkoutHistory() {
     showLoading();
+    stopHistoryScroll();
     
     try {
         // In development, always load history from local storage
@@ -861,15 +877,11 @@ async function loadWorkoutHistory() {
             hideLoading();
             return;
         }
-        const response = await fetch(`${API_BASE}/workouts/history`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
+        const workouts = await fetchWorkoutHistoryPage('');
         
-        if (response.ok) {
-            const data = await response.json();
-            displayWorkoutHistory(data.workouts);
+        if (workouts) {
+            displayWorkoutHistory(workouts);
+            startHistoryScroll();
         } else {
             showToast('Failed to load workout history', 'error');
         }
@@ -880,6 +892,81 @@ async function loadWorkoutHistory() {
     hideLoading();
 }
 
+async function fetchWorkoutHistoryPage(cursor) {
+    const response = await fetch(`${API_BASE}/workouts/history?format=compact&limit=${HISTORY_PAGE_SIZE}&cursor=${encodeURIComponent(cursor)}`, {
+        headers: {
+            'Authorization': `Bearer ${authToken}`
+        }
+    });
+    
+    if (!response.ok) return null;
+    const data = await response.json();
+    historyCursor = data.next_cursor;
+    return hydrateCompactWorkouts(data);
+}
+
+async function loadMoreWorkoutHistory() {
+    if (!historyCursor || historyLoading) return;
+    historyLoading = true;
+    
+    try {
+        const workouts = await fetchWorkoutHistoryPage(historyCursor);
+        if (workouts) {
+            workouts.forEach(appendHistoryItem);
+        } else {
+            showToast('Failed to load more history', 'error');
+        }
+    } catch (error) {
+        showToast('Network error loading history', 'error');
+    }
+    
+    historyLoading = false;
+    if (!historyCursor) stopHistoryScroll();
+}
+
+// Load the next page whenever the sentinel below the list scrolls into view
+function startHistoryScroll() {
+    const sentinel = document.getElementById('history-sentinel');
+    if (!historyCursor || !sentinel || !('IntersectionObserver' in window)) return;
+    
+    historyObserver = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadMoreWorkoutHistory();
+    });
+    historyObserver.observe(sentinel);
+}
+
+function stopHistoryScroll() {
+    if (historyObserver) {
+        historyObserver.disconnect();
+        historyObserver = null;
+    }
+}
+
+// Rebuild full workout objects from a ?format=compact response, where sets are
+// flat rows and each exercise/template is sent once in a lookup table
+function hydrateCompactWorkouts(data) {
+    const fields = data.set_fields;
+    const exercises = data.exercises || {};
+    const templates = {};
+    Object.entries(data.templates || {}).forEach(([id, template]) => {
+        templates[id] = {
+            ...template,
+            exercises: template.exercises.map(te => ({ ...te, exercise: exercises[te.exercise_id] }))
+        };
+    });
+    
+    return data.workouts.map(workout => ({
+        ...workout,
+        template: workout.template_id != null ? templates[workout.template_id] || null : null,
+        sets: workout.sets.map(row => {
+            const set = {};
+            fields.forEach((field, i) => { set[field] = row[i]; });
+            set.exercise = exercises[set.exercise_id];
+            return set;
+        })
+    }));
+}
+
 function displayWorkoutHistory(workouts) {
     const container = document.getElementById('history-list');
     container.innerHTML = '';
@@ -889,27 +976,30 @@ function displayWorkoutHistory(workouts) {
         return;
     }
     
-    workouts.forEach(workout => {
-        const historyItem = document.createElement('div');
-        historyItem.className = 'history-item';
-        historyItem.onclick = () => showWorkoutDetails(workout);
-        
-        const workoutDate = new Date(workout.date).toLocaleDateString();
-        const totalSets = workout.sets.length;
-        const exercises = [...new Set(workout.sets.map(s => s.exercise.name))];
-        
-        historyItem.innerHTML = `
-            <div class="history-header">
-                <h4>${workout.template ? workout.template.name : 'Custom Workout'}</h4>
-                <span class="history-date">${workoutDate}</span>
-            </div>
-            <div class="history-summary">
-                ${exercises.length} exercises • ${totalSets} sets • ${workout.duration_minutes || 0} minutes
-            </div>
-        `;
-        
-        container.appendChild(historyItem);
-    });
+    workouts.forEach(appendHistoryItem);
+}
+
+function appendHistoryItem(workout) {
+    const container = document.getElementById('history-list');
+    const historyItem = document.createElement('div');
+    historyItem.className = 'history-item';
+    historyItem.onclick = () => showWorkoutDetails(workout);
+    
+    const workoutDate = new Date(workout.date).toLocaleDateString();
+    const totalSets = workout.sets.length;
+    const exercises = [...new Set(workout.sets.map(s => s.exercise.name))];
+    
+    historyItem.innerHTML = `
+        <div class="history-header">
+            <h4>${workout.template ? workout.template.name : 'Custom Workout'}</h4>
+            <span class="history-date">${workoutDate}</span>
+        </div>
+        <div class="history-summary">
+            ${exercises.length} exercises • ${totalSets} sets • ${workout.duration_minutes || 0} minutes
+        </div>
+    `;
+    
+    container.appendChild(historyItem);
 }
 
 function showWorkoutDetails(workout) {
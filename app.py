@@ -1,29 +1,39 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, request, jsonify, Response
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
-from models import db, User, Exercise, WorkoutTemplate, TemplateExercise, WorkoutLog, SetLog
-import json
+from flask_jwt_extended import JWTManager, jwt_required, verify_jwt_in_request, create_access_token, get_jwt_identity
+from database import configure_database
+from models import db, User, Exercise, WorkoutLog, SetLog, UserStats
+from queries import workout_history_query, workout_history_after, workout_detail_query, template_query, exercise_query
+from catalog_cache import cached_catalog_response
+from exercise_search import exercise_search, DEFAULT_LIMIT as SEARCH_DEFAULT_LIMIT, MAX_LIMIT as SEARCH_MAX_LIMIT
+from ingest import ingest_workouts, iter_ndjson
+import export
+from migrations import run_migrations
+from seed import seed_catalog, SEED_VERSION
+from analytics import record_sets, exercise_progress, weekly_volume, DEFAULT_WEEKS, MAX_WEEKS
+from records import update_personal_records
+from leaderboards import leaderboard, record_workouts as record_leaderboards, METRICS as LEADERBOARD_METRICS, \
+    EXERCISE_METRICS, PERIODS, DEFAULT_LIMIT as LEADERBOARD_DEFAULT_LIMIT, MAX_LIMIT as LEADERBOARD_MAX_LIMIT
+from progression import next_session_targets, invalidate_targets
+from tips import tips_service
+from jobs import enqueue, queue_stats, worker_pool
+from passwords import HashingBusy
+from user_cache import user_snapshot
+import metrics
+from encoding import init_encoding
 from datetime import datetime, timedelta 
+import hmac
 import os
  
-try:
-    import google.generativeai as genai
-    _HAS_GEMINI = True
-except Exception:
-    _HAS_GEMINI = False 
- 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///fitness_tracker.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-insecure-secret')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
+api = Blueprint('api', __name__)
 
-db.init_app(app)
-jwt = JWTManager(app)
-CORS(app)
+def _busy_response(e):
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
 
 # User Authentication Routes
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def register():
     try:
         data = request.get_json()
@@ -54,10 +64,12 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except HashingBusy as e:
+        return _busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
@@ -68,6 +80,14 @@ def login():
         user = User.query.filter_by(email=data['email']).first()
         
         if user and user.check_password(data['password']):
+            # Upgrade hashes made with an older cost factor while we have the password
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(data['password'])
+                    db.session.commit()
+                except HashingBusy:
+                    pass
+            
             access_token = create_access_token(identity=user.id)
             return jsonify({
                 'message': 'Login successful',
@@ -77,25 +97,26 @@ def login():
         else:
             return jsonify({'error': 'Invalid credentials'}), 401
             
+    except HashingBusy as e:
+        return _busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/profile', methods=['GET'])
+@api.route('/api/user/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        snapshot = user_snapshot(get_jwt_identity())
         
-        if not user:
+        if not snapshot:
             return jsonify({'error': 'User not found'}), 404
             
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': snapshot['user']}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/onboarding', methods=['PUT'])
+@api.route('/api/user/onboarding', methods=['PUT'])
 @jwt_required()
 def complete_onboarding():
     try:
@@ -107,11 +128,14 @@ def complete_onboarding():
         
         data = request.get_json()
         
-        user.goals = json.dumps(data.get('goals', []))
+        user.goals = data.get('goals', [])
         user.schedule = data.get('schedule')
-        user.equipment = json.dumps(data.get('equipment', []))
+        user.equipment = data.get('equipment', [])
         user.experience_level = data.get('experience_level')
         user.onboarding_completed = True
+        if tips_service.model is not None:
+            # Have tips ready by the time the client asks for them
+            enqueue('warm_tips', {'profile': user.profile()})
         
         db.session.commit()
         
@@ -124,47 +148,87 @@ def complete_onboarding():
         return jsonify({'error': str(e)}), 500
 
 # Workout Template Routes
-@app.route('/api/workouts/templates', methods=['GET'])
+@api.route('/api/workouts/templates', methods=['GET'])
 @jwt_required()
 def get_workout_templates():
     try:
-        templates = WorkoutTemplate.query.all()
-        return jsonify({
-            'templates': [template.to_dict() for template in templates]
-        }), 200
+        return cached_catalog_response('templates', lambda: {
+            'templates': [template.to_dict() for template in template_query().all()]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/workouts/templates/<int:template_id>/next', methods=['GET'])
+@jwt_required()
+def get_next_session_targets(template_id):
+    """Weight x reps targets for the user's next session of a template"""
+    try:
+        user_id = get_jwt_identity()
+        targets = next_session_targets(user_id, template_id)
+        
+        if targets is None:
+            return jsonify({'error': 'Template not found'}), 404
+        
+        return jsonify(targets), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/exercises', methods=['GET'])
+def _csv_arg(name):
+    """Sorted distinct values of a comma-separated query arg, or None if absent"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return tuple(sorted({part.strip().lower() for part in value.split(',') if part.strip()}))
+
+@api.route('/api/exercises', methods=['GET'])
 @jwt_required()
 def get_exercises():
     try:
         category = request.args.get('category')
-        if category:
-            exercises = Exercise.query.filter_by(category=category).all()
-        else:
-            exercises = Exercise.query.all()
-            
-        return jsonify({
-            'exercises': [exercise.to_dict() for exercise in exercises]
-        }), 200
+        # Comma-separated; equipment lists what the user has, muscle matches any
+        equipment = _csv_arg('equipment')
+        muscles = _csv_arg('muscle')
+        
+        def render():
+            exercises = exercise_query(category, equipment, muscles).all()
+            return {'exercises': [exercise.to_dict() for exercise in exercises]}
+        
+        return cached_catalog_response(('exercises', category, equipment, muscles), render)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/exercises/search', methods=['GET'])
+@jwt_required()
+def search_exercises():
+    """Ranked prefix/typo-tolerant search over exercise names, muscles and equipment"""
+    try:
+        query = request.args.get('q', '')
+        limit = min(max(request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
+        return jsonify({'query': query, 'results': exercise_search.search(query, limit)}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Workout Logging Routes for the system
-@app.route('/api/workouts/log', methods=['POST'])
+@api.route('/api/workouts/log', methods=['POST'])
 @jwt_required()
 def log_workout():
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
         
+        # Lock the aggregates before the new workout is flushed so a first-time
+        # backfill from history does not count it twice
+        stats = UserStats.for_user(user_id, lock=True)
+        
         # Create workout log
         workout_log = WorkoutLog(
             user_id=user_id,
             template_id=data.get('template_id'),
+            date=datetime.utcnow(),
             duration_minutes=data.get('duration_minutes'),
             notes=data.get('notes', '')
         )
@@ -173,6 +237,7 @@ def log_workout():
         db.session.flush()  # Get the ID
         
         # Add set logs
+        set_logs = []
         for set_data in data.get('sets', []):
             set_log = SetLog(
                 workout_log_id=workout_log.id,
@@ -183,248 +248,333 @@ def log_workout():
                 rpe=set_data.get('rpe')
             ) 
             db.session.add(set_log)
+            set_logs.append(set_log)
+        db.session.flush()  # Get the set IDs
+        
+        # Dashboard, analytics and record aggregates commit together with the workout
+        stats.record_workout(workout_log.date)
+        record_sets(user_id, [(workout_log.date, s.exercise_id, s.weight, s.reps) for s in set_logs])
+        new_records = update_personal_records(user_id, [
+            (s.id, s.exercise_id, s.weight, s.reps, workout_log.date) for s in set_logs
+        ])
+        record_leaderboards(user_id, [(workout_log.date, [(s.exercise_id, s.weight, s.reps) for s in set_logs])])
+        invalidate_targets(user_id, [workout_log.template_id])
         
         db.session.commit()
         
+        # Reload the committed workout with its tree in a fixed number of queries
+        workout_log = workout_detail_query(user_id, workout_log.id).one()
+        workout = workout_log.to_dict()
+        for set_dict in workout['sets']:
+            set_dict['is_pr'] = set_dict['id'] in new_records
+        
         return jsonify({
             'message': 'Workout logged successfully',
-            'workout': workout_log.to_dict()
+            'workout': workout,
+            'personal_records': [{
+                'set_log_id': s.id,
+                'exercise_id': s.exercise_id,
+                'reps': s.reps,
+                'weight': s.weight,
+                'previous_weight': new_records[s.id]
+            } for s in set_logs if s.id in new_records]
         }), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/workouts/history', methods=['GET'])
+@api.route('/api/workouts/bulk', methods=['POST'])
+@jwt_required()
+def bulk_log_workouts():
+    try:
+        user_id = get_jwt_identity()
+        
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            # One workout per line, parsed as the upload streams in
+            items = iter_ndjson(request.stream)
+        else:
+            data = request.get_json(silent=True)
+            items = data.get('workouts') if isinstance(data, dict) else data
+            if not isinstance(items, list):
+                return jsonify({'error': 'Expected a JSON array of workouts or NDJSON'}), 400
+        
+        summary, results = ingest_workouts(user_id, items)
+        
+        return jsonify({
+            'message': 'Bulk upload processed',
+            'summary': summary,
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def _compact_workouts(workouts):
+    """Flatten workouts to set rows plus exercise/template dictionaries sent once"""
+    exercises = {}
+    templates = {}
+    for workout in workouts:
+        for set_log in workout.set_logs:
+            if set_log.exercise_id not in exercises:
+                exercises[set_log.exercise_id] = set_log.exercise.to_dict()
+        template = workout.template
+        if template and template.id not in templates:
+            templates[template.id] = template.to_compact()
+            for te in template.template_exercises:
+                if te.exercise_id not in exercises:
+                    exercises[te.exercise_id] = te.exercise.to_dict()
+    
+    return {
+        'format': 'compact',
+        'set_fields': SetLog.ROW_FIELDS,
+        'workouts': [workout.to_compact() for workout in workouts],
+        'exercises': exercises,
+        'templates': templates
+    }
+
+def _workout_history_by_cursor(user_id):
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    try:
+        workouts, next_cursor = workout_history_after(user_id, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.args.get('format') == 'compact':
+        payload = _compact_workouts(workouts)
+    else:
+        payload = {'workouts': [workout.to_dict() for workout in workouts]}
+    payload['next_cursor'] = next_cursor
+    
+    # The total is optional and comes from the maintained aggregates, not COUNT(*)
+    if request.args.get('include_total') in ('1', 'true'):
+        payload['total'] = UserStats.for_user(user_id).total_workouts
+        db.session.commit()  # Keeps a freshly built row
+    
+    return jsonify(payload), 200
+
+@api.route('/api/workouts/history', methods=['GET'])
 @jwt_required()
 def get_workout_history():
     try:
         user_id = get_jwt_identity()
+        
+        # Cursor mode: ?cursor=<opaque>&limit=N (an empty cursor starts from the newest)
+        if 'cursor' in request.args:
+            return _workout_history_by_cursor(user_id)
+        
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
-        workouts = WorkoutLog.query.filter_by(user_id=user_id)\
-                                 .order_by(WorkoutLog.date.desc())\
-                                 .paginate(page=page, per_page=per_page, error_out=False)
+        workouts = workout_history_query(user_id)\
+                       .paginate(page=page, per_page=per_page, error_out=False)
         
-        return jsonify({
-            'workouts': [workout.to_dict() for workout in workouts.items],
+        if request.args.get('format') == 'compact':
+            payload = _compact_workouts(workouts.items)
+        else:
+            payload = {'workouts': [workout.to_dict() for workout in workouts.items]}
+        
+        payload.update({
             'total': workouts.total,
             'pages': workouts.pages,
             'current_page': page
-        }), 200
+        })
+        return jsonify(payload), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/workouts/export', methods=['GET'])
+@jwt_required()
+def export_workouts():
+    """Stream the user's full history: ?format=ndjson|csv, &gzip=1 to compress"""
+    try:
+        user_id = get_jwt_identity()
+        export_format = request.args.get('format', 'ndjson')
+        
+        if export_format not in export.FORMATS:
+            return jsonify({'error': f"format must be one of: {', '.join(export.FORMATS)}"}), 400
+        
+        return export.export_response(user_id, export_format, compress=request.args.get('gzip') in ('1', 'true'))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/workouts/stats', methods=['GET'])
+@jwt_required()
+def get_workout_stats():
+    try:
+        user_id = get_jwt_identity()
+        stats = UserStats.for_user(user_id).to_dict()
+        
+        # Persist a freshly built row so later reads are a single lookup
+        db.session.commit()
+        
+        return jsonify({'stats': stats}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/workouts/<int:workout_id>', methods=['GET'])
+@api.route('/api/workouts/<int:workout_id>', methods=['GET'])
 @jwt_required()
 def get_workout_details(workout_id):
     try:
         user_id = get_jwt_identity()
-        workout = WorkoutLog.query.filter_by(id=workout_id, user_id=user_id).first()
+        workout = workout_detail_query(user_id, workout_id).first()
         
         if not workout:
             return jsonify({'error': 'Workout not found'}), 404
+        
+        if request.args.get('format') == 'compact':
+            payload = _compact_workouts([workout])
+            payload['workout'] = payload.pop('workouts')[0]
+            return jsonify(payload), 200
             
         return jsonify({'workout': workout.to_dict()}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def seed_data():
-    """Seed the database with initial data"""
-    
-    # Create exercises
-    exercises_data = [
-        # Push exercises
-        {'name': 'Bench Press', 'category': 'push', 'muscle_groups': '["chest", "triceps", "shoulders"]', 'equipment_needed': '["barbell", "bench"]'},
-        {'name': 'Overhead Press', 'category': 'push', 'muscle_groups': '["shoulders", "triceps"]', 'equipment_needed': '["barbell"]'},
-        {'name': 'Incline Dumbbell Press', 'category': 'push', 'muscle_groups': '["chest", "shoulders"]', 'equipment_needed': '["dumbbells", "bench"]'},
-        {'name': 'Dips', 'category': 'push', 'muscle_groups': '["chest", "triceps"]', 'equipment_needed': '["dip_bars"]'},
-        
-        # Pull exercises
-        {'name': 'Pull-ups', 'category': 'pull', 'muscle_groups': '["lats", "biceps"]', 'equipment_needed': '["pull_up_bar"]'},
-        {'name': 'Barbell Rows', 'category': 'pull', 'muscle_groups': '["lats", "rhomboids", "biceps"]', 'equipment_needed': '["barbell"]'},
-        {'name': 'Lat Pulldowns', 'category': 'pull', 'muscle_groups': '["lats", "biceps"]', 'equipment_needed': '["cable_machine"]'},
-        {'name': 'Face Pulls', 'category': 'pull', 'muscle_groups': '["rear_delts", "rhomboids"]', 'equipment_needed': '["cable_machine"]'},
-        
-        # Legs exercises
-        {'name': 'Squats', 'category': 'legs', 'muscle_groups': '["quads", "glutes"]', 'equipment_needed': '["barbell"]'},
-        {'name': 'Deadlifts', 'category': 'legs', 'muscle_groups': '["hamstrings", "glutes", "lower_back"]', 'equipment_needed': '["barbell"]'},
-        {'name': 'Romanian Deadlifts', 'category': 'legs', 'muscle_groups': '["hamstrings", "glutes"]', 'equipment_needed': '["barbell"]'},
-        {'name': 'Leg Press', 'category': 'legs', 'muscle_groups': '["quads", "glutes"]', 'equipment_needed': '["leg_press_machine"]'},
-        
-        # Upper body compound
-        {'name': 'Barbell Curls', 'category': 'upper', 'muscle_groups': '["biceps"]', 'equipment_needed': '["barbell"]'},
-        {'name': 'Close-Grip Bench Press', 'category': 'upper', 'muscle_groups': '["triceps", "chest"]', 'equipment_needed': '["barbell", "bench"]'},
-        
-        # Lower body
-        {'name': 'Calf Raises', 'category': 'lower', 'muscle_groups': '["calves"]', 'equipment_needed': '["none"]'},
-        {'name': 'Lunges', 'category': 'lower', 'muscle_groups': '["quads", "glutes"]', 'equipment_needed': '["dumbbells"]'}
-    ]
-    
-    for exercise_data in exercises_data:
-        if not Exercise.query.filter_by(name=exercise_data['name']).first():
-            exercise = Exercise(**exercise_data)
-            db.session.add(exercise)
-    
-    db.session.commit()
-    
-    # Create workout templates
-    # Push/Pull/Legs template
-    ppl_template = WorkoutTemplate(
-        name='Push/Pull/Legs',
-        type='push_pull_legs',
-        description='A 3-day split focusing on pushing movements, pulling movements, and leg exercises'
-    )
-    db.session.add(ppl_template)
-    db.session.flush()
-    
-    # Upper/Lower template
-    ul_template = WorkoutTemplate(
-        name='Upper/Lower',
-        type='upper_lower',
-        description='A 2-day split alternating between upper body and lower body exercises'
-    )
-    db.session.add(ul_template)
-    db.session.flush()
-    
-    # Add exercises to Push/Pull/Legs template
-    ppl_exercises = [
-        {'exercise_name': 'Bench Press', 'sets': 4, 'reps_range': '6-8', 'order': 1},
-        {'exercise_name': 'Overhead Press', 'sets': 3, 'reps_range': '8-10', 'order': 2},
-        {'exercise_name': 'Incline Dumbbell Press', 'sets': 3, 'reps_range': '10-12', 'order': 3},
-        {'exercise_name': 'Dips', 'sets': 3, 'reps_range': '12-15', 'order': 4}
-    ]
-    
-    for i, ex_data in enumerate(ppl_exercises):
-        exercise = Exercise.query.filter_by(name=ex_data['exercise_name']).first()
-        if exercise:
-            template_exercise = TemplateExercise(
-                template_id=ppl_template.id,
-                exercise_id=exercise.id,
-                sets=ex_data['sets'],
-                reps_range=ex_data['reps_range'],
-                order=ex_data['order']
-            )
-            db.session.add(template_exercise)
-    
-    # Add exercises to Upper/Lower template
-    ul_exercises = [
-        {'exercise_name': 'Bench Press', 'sets': 4, 'reps_range': '6-8', 'order': 1},
-        {'exercise_name': 'Barbell Rows', 'sets': 4, 'reps_range': '6-8', 'order': 2},
-        {'exercise_name': 'Overhead Press', 'sets': 3, 'reps_range': '8-10', 'order': 3},
-        {'exercise_name': 'Pull-ups', 'sets': 3, 'reps_range': '8-12', 'order': 4}
-    ]
-    
-    for ex_data in ul_exercises:
-        exercise = Exercise.query.filter_by(name=ex_data['exercise_name']).first()
-        if exercise:
-            template_exercise = TemplateExercise(
-                template_id=ul_template.id,
-                exercise_id=exercise.id,
-                sets=ex_data['sets'],
-                reps_range=ex_data['reps_range'],
-                order=ex_data['order']
-            )
-            db.session.add(template_exercise)
-    
-    db.session.commit()
-    print("Database seeded successfully!")
+# Analytics Routes
+@api.route('/api/analytics/exercise/<int:exercise_id>', methods=['GET'])
+@jwt_required()
+def get_exercise_analytics(exercise_id):
+    try:
+        user_id = get_jwt_identity()
+        exercise = db.session.get(Exercise, exercise_id)
+        
+        if not exercise:
+            return jsonify({'error': 'Exercise not found'}), 404
+        
+        weeks = request.args.get('weeks', type=int)
+        if weeks is not None:
+            weeks = min(max(weeks, 1), MAX_WEEKS)
+        return jsonify(exercise_progress(user_id, exercise, weeks)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-# --------- AI: Profile Tips ---------
-def _profile_to_prompt(profile: dict) -> str:
-    goals = ", ".join(profile.get('goals', [])) or "unspecified goals"
-    equipment = ", ".join(profile.get('equipment', [])) or "no equipment"
-    schedule = profile.get('schedule') or "unspecified schedule"
-    experience = profile.get('experience_level') or "unspecified experience"
-    return (
-        f"User profile:\n"
-        f"- Goals: {goals}\n"
-        f"- Schedule: {schedule}\n"
-        f"- Equipment: {equipment}\n"
-        f"- Experience: {experience}\n\n"
-        f"Provide 5 concise, actionable training tips tailored to the user."
-        f" Focus on exercise selection, progression, recovery, and adherence."
-        f" Use bullet points, 1 sentence each."
-    )
+@api.route('/api/analytics/volume', methods=['GET'])
+@jwt_required()
+def get_volume_analytics():
+    try:
+        user_id = get_jwt_identity()
+        weeks = min(max(request.args.get('weeks', DEFAULT_WEEKS, type=int), 1), MAX_WEEKS)
+        
+        return jsonify(weekly_volume(user_id, weeks)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-def _local_tips(profile: dict):
-    tips = []
-    goals = set(profile.get('goals', []))
-    equipment = set(profile.get('equipment', []))
-    schedule = (profile.get('schedule') or '').lower()
-    experience = (profile.get('experience_level') or '').lower()
+@api.route('/api/leaderboards/<metric>', methods=['GET'])
+@jwt_required()
+def get_leaderboard(metric):
+    try:
+        user_id = get_jwt_identity()
+        period = request.args.get('period', 'week')
+        exercise_id = request.args.get('exercise_id', type=int)
+        limit = min(max(request.args.get('limit', LEADERBOARD_DEFAULT_LIMIT, type=int), 1), LEADERBOARD_MAX_LIMIT)
+        
+        if metric not in LEADERBOARD_METRICS:
+            return jsonify({'error': f"metric must be one of {', '.join(LEADERBOARD_METRICS)}"}), 400
+        if period not in PERIODS:
+            return jsonify({'error': f"period must be one of {', '.join(PERIODS)}"}), 400
+        if (metric in EXERCISE_METRICS) != (exercise_id is not None):
+            return jsonify({'error': f"exercise_id is required for {metric}" if metric in EXERCISE_METRICS
+                            else f"exercise_id does not apply to {metric}"}), 400
+        when = None
+        if request.args.get('date'):
+            try:
+                when = datetime.strptime(request.args['date'], '%Y-%m-%d')
+            except ValueError:
+                return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+        
+        return jsonify(leaderboard(user_id, metric, period, when, exercise_id, limit)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-    if 'muscle_gain' in goals or 'strength' in goals:
-        tips.append("Prioritize compound lifts and add small weekly load or rep increases.")
-    if 'weight_loss' in goals:
-        tips.append("Keep rests short and add brisk walks on non-training days to raise weekly activity.")
-    if 'endurance' in goals:
-        tips.append("Include 1–2 zone-2 cardio sessions weekly alongside resistance training.")
-    if 'cable_machine' in equipment:
-        tips.append("Use cable moves to keep tension constant for accessories like rows and face pulls.")
-    if 'bodyweight_only' in equipment and not equipment - {'bodyweight_only'}:
-        tips.append("Use slow eccentrics and pause reps to make bodyweight sessions more effective.")
-    if '3-4' in schedule or '3-4 days' in schedule:
-        tips.append("Run a simple upper/lower split across two alternating days each week.")
-    if experience in ('beginner', '0-1 years'):
-        tips.append("Repeat the same key lifts to build skill; keep RPE ~7–8 and track every session.")
-    if not tips:
-        tips = [
-            "Aim for 8–12 hard sets per muscle per week and log all sessions.",
-            "Warm up with lighter sets, then keep working sets within 2–3 reps of failure.",
-            "Progress either weight or reps each week on your main lifts.",
-            "Sleep 7–9 hours and keep protein ~1.6–2.2 g/kg bodyweight.",
-            "Deload 1 week every 6–8 weeks or when fatigue accumulates."
-        ]
-    return tips[:5]
+def seed_data():
+    """Seed the catalog from the manifest in seed.py, unless it is already current"""
+    if seed_catalog():
+        print(f"Database seeded (catalog version {SEED_VERSION})")
 
-@app.route('/api/ai/profile-tips', methods=['POST'])
+# --------- AI: Profile Tips ---------
+@api.route('/api/ai/profile-tips', methods=['POST'])
 def profile_tips():
     try:
         data = request.get_json() or {}
         # Allow auth-based fetch if token present
         if not data.get('profile') and request.headers.get('Authorization'):
             try:
+                verify_jwt_in_request(optional=True)
                 user_id = get_jwt_identity()
                 if user_id:
-                    user = User.query.get(user_id)
-                    if user:
-                        data['profile'] = {
-                            'goals': json.loads(user.goals) if user.goals else [],
-                            'schedule': user.schedule,
-                            'equipment': json.loads(user.equipment) if user.equipment else [],
-                            'experience_level': user.experience_level
-                        }
+                    snapshot = user_snapshot(user_id)
+                    if snapshot:
+                        data['profile'] = snapshot['profile']
             except Exception:
                 pass
 
         profile = data.get('profile') or {}
 
-        # If Gemini configured, call it
-        if _HAS_GEMINI and os.getenv('GOOGLE_API_KEY'):
-            try:
-                genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
-                model = genai.GenerativeModel('gemini-1.5-flash')
-                prompt = _profile_to_prompt(profile)
-                resp = model.generate_content(prompt)
-                text = (resp.text or '').strip()
-                # Return as lines
-                tips = [line.lstrip('-• ').strip() for line in text.split('\n') if line.strip()][:5]
-                if tips:
-                    return jsonify({'tips': tips}), 200
-            except Exception:
-                pass
+        # Cached, coalesced and deadline-bound; falls back to local tips
+        return jsonify({'tips': tips_service.get_tips(profile)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Fallback local tips
-        return jsonify({'tips': _local_tips(profile)}), 200
+# --------- Operations ---------
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint; set METRICS_TOKEN to require a bearer token"""
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/admin/jobs', methods=['GET'])
+def job_queue_stats():
+    """Background job queue depth and latency; only served when ADMIN_TOKEN is set and sent as a bearer token"""
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        return jsonify(queue_stats()), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-if __name__ == '__main__':
+def create_app(config=None):
+    """Build the Flask app; `config` overrides settings such as SQLALCHEMY_DATABASE_URI"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-insecure-secret')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
+    if config:
+        app.config.update(config)
+    
+    configure_database(app, db)
+    metrics.init_metrics(app, db)
+    init_encoding(app)
+    JWTManager(app)
+    CORS(app)
+    app.register_blueprint(api)
+    return app
+
+def init_db(app):
+    """Create tables, migrate and seed the catalog; run once per deployment, before serving"""
     with app.app_context():
         db.create_all()
+        run_migrations()
         seed_data()
+
+if __name__ == '__main__':
+    app = create_app()
+    init_db(app)
+    if os.getenv('WERKZEUG_RUN_MAIN') == 'true':
+        # Only in the reloader's child, which is the process serving requests
+        worker_pool.start(app)
     
+    # Development server; use serve.py (or any WSGI server on wsgi:app) for production
     app.run(host='0.0.0.0', debug=True, port=5000)
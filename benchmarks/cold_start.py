@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost and catalog size across repeated restarts.
+
+Each restart is a fresh interpreter that imports the app and runs init_db()
+against the same scratch SQLite file, like a container restart. The first
+boot creates and seeds the database; later boots should find the seed version
+current and write nothing. Prints the time spent in init_db(), the whole
+process wall time and the catalog row counts after every restart, and exits
+non-zero if any count changes after the first boot.
+
+    python benchmarks/cold_start.py --restarts 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOOT = """
+import json, time
+start = time.perf_counter()
+from app import create_app, init_db
+app = create_app()
+imported = time.perf_counter()
+init_db(app)
+done = time.perf_counter()
+from models import db, Exercise, WorkoutTemplate, TemplateExercise
+with app.app_context():
+    counts = {model.__tablename__: db.session.query(model).count()
+              for model in (Exercise, WorkoutTemplate, TemplateExercise)}
+print(json.dumps({'import_ms': (imported - start) * 1000, 'init_ms': (done - imported) * 1000, 'counts': counts}))
+"""
+
+
+def boot(env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', BOOT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    return dict(json.loads(result.stdout.strip().splitlines()[-1]), wall_ms=wall_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--restarts', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'cold_start.db')}")
+        env.pop('GOOGLE_API_KEY', None)
+
+        print(f"{'boot':>4}  {'init_db':>9}  {'import':>9}  {'process':>9}  catalog rows")
+        runs = []
+        for n in range(1, args.restarts + 1):
+            run = boot(env)
+            runs.append(run)
+            counts = ', '.join(f'{table}={count}' for table, count in run['counts'].items())
+            print(f"{n:>4}  {run['init_ms']:>7.1f}ms  {run['import_ms']:>7.1f}ms  {run['wall_ms']:>7.1f}ms  {counts}")
+
+    if any(run['counts'] != runs[0]['counts'] for run in runs[1:]):
+        print('Catalog grew across restarts')
+        sys.exit(1)
+    print('Catalog stable across restarts')
+
+
+if __name__ == '__main__':
+    main()
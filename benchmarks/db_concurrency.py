@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Mixed read/write throughput on SQLite, before and after database.py tuning.
+
+Writers log workouts (one workout_log plus its set_log rows per transaction)
+while readers fetch history pages, all on separate threads sharing one engine.
+Each configuration runs on a fresh database file so results are comparable.
+
+    python benchmarks/db_concurrency.py --writers 4 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+from database import engine_options, tune_engine
+from models import db, User, Exercise, WorkoutLog, SetLog
+
+SETS_PER_WORKOUT = 10
+
+
+def build_engine(path, tuned):
+    url = f'sqlite:///{path}'
+    if not tuned:
+        # What the app used before: bare URI, rollback journal, default pool
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    tune_engine(engine)
+    return engine
+
+
+def seed(engine, users, workouts_per_user):
+    db.metadata.create_all(engine)
+    start = datetime.utcnow() - timedelta(days=workouts_per_user)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': u, 'email': f'user{u}@bench', 'password_hash': 'x', 'name': f'User {u}'}
+            for u in range(1, users + 1)
+        ])
+        conn.execute(insert(Exercise), [
+            {'id': e, 'name': f'Exercise {e}', 'category': 'push'} for e in range(1, 11)
+        ])
+        conn.execute(insert(WorkoutLog), [
+            {'user_id': u, 'date': start + timedelta(days=d)}
+            for u in range(1, users + 1) for d in range(workouts_per_user)
+        ])
+        workout_ids = conn.execute(select(WorkoutLog.id)).scalars().all()
+        conn.execute(insert(SetLog), [
+            {'workout_log_id': w, 'exercise_id': 1 + s % 10, 'set_number': s + 1, 'weight': 60.0, 'reps': 8}
+            for w in workout_ids for s in range(SETS_PER_WORKOUT)
+        ])
+
+
+def writer(engine, users, stop, counts, seed_value):
+    n = seed_value
+    while not stop.is_set():
+        n += 1
+        try:
+            with engine.begin() as conn:
+                workout_id = conn.execute(
+                    insert(WorkoutLog).values(user_id=1 + n % users, date=datetime.utcnow())
+                ).inserted_primary_key[0]
+                conn.execute(insert(SetLog), [
+                    {'workout_log_id': workout_id, 'exercise_id': 1 + s % 10, 'set_number': s + 1,
+                     'weight': 60.0, 'reps': 8} for s in range(SETS_PER_WORKOUT)
+                ])
+            counts['writes'] += 1
+        except OperationalError:
+            counts['errors'] += 1
+
+
+def reader(engine, users, stop, counts, seed_value):
+    n = seed_value
+    while not stop.is_set():
+        n += 1
+        try:
+            with engine.connect() as conn:
+                ids = conn.execute(
+                    select(WorkoutLog.id).where(WorkoutLog.user_id == 1 + n % users)
+                                         .order_by(WorkoutLog.date.desc()).limit(10)
+                ).scalars().all()
+                conn.execute(select(SetLog).where(SetLog.workout_log_id.in_(ids))).all()
+            counts['reads'] += 1
+        except OperationalError:
+            counts['errors'] += 1
+
+
+def run(tuned, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(os.path.join(tmp, 'bench.db'), tuned)
+        seed(engine, args.users, args.workouts)
+
+        stop = threading.Event()
+        counts = {'writes': 0, 'reads': 0, 'errors': 0}
+        threads = [threading.Thread(target=writer, args=(engine, args.users, stop, counts, i))
+                   for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(engine, args.users, stop, counts, i))
+                    for i in range(args.readers)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    return {key: value / args.seconds for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--workouts', type=int, default=50, help='seeded workouts per user')
+    args = parser.parse_args()
+
+    print(f'{args.writers} writers, {args.readers} readers, {args.seconds:g}s per run')
+    print(f"{'config':<10}{'writes/s':>12}{'reads/s':>12}{'errors/s':>12}")
+    for label, tuned in (('default', False), ('tuned', True)):
+        result = run(tuned, args)
+        print(f"{label:<10}{result['writes']:>12.1f}{result['reads']:>12.1f}{result['errors']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Exercise search latency on a synthetic catalog.
+
+Builds a SearchIndex over generated exercises (names, muscle groups and
+equipment drawn from realistic vocabularies), then times exact, prefix and
+misspelled queries and a single-exercise incremental update.
+
+    python benchmarks/exercise_search.py --exercises 5000 --queries 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exercise_search import SearchIndex
+
+MODIFIERS = ['incline', 'decline', 'seated', 'standing', 'single arm', 'close grip', 'wide grip',
+             'paused', 'tempo', 'deficit', 'kneeling', 'reverse', 'lying', 'alternating']
+MOVEMENTS = ['bench press', 'overhead press', 'row', 'curl', 'extension', 'fly', 'raise', 'squat',
+             'deadlift', 'lunge', 'pulldown', 'pull up', 'dip', 'hip thrust', 'crunch', 'shrug']
+MUSCLES = ['chest', 'triceps', 'shoulders', 'lats', 'biceps', 'rhomboids', 'rear_delts', 'quads',
+           'glutes', 'hamstrings', 'lower_back', 'calves', 'abs', 'traps', 'forearms']
+EQUIPMENT = ['barbell', 'dumbbells', 'bench', 'cable_machine', 'kettlebell', 'ez_bar', 'smith_machine',
+             'resistance_band', 'pull_up_bar', 'dip_bars', 'leg_press_machine', 'none']
+QUERIES = ['bench', 'ben', 'benhc pres', 'dumbel row', 'incline', 'incl dumb', 'sqaut', 'hamstrngs',
+           'cable fly', 'pull', 'overhed', 'kettlebell swing', 'lats', 'tricep extension']
+
+
+def catalog(count, rng):
+    for exercise_id in range(1, count + 1):
+        movement = rng.choice(MOVEMENTS)
+        yield {
+            'id': exercise_id,
+            'name': f'{rng.choice(MODIFIERS)} {rng.choice(EQUIPMENT).replace("_", " ")} {movement}'.title(),
+            'category': rng.choice(['push', 'pull', 'legs', 'upper', 'lower']),
+            'muscle_groups': rng.sample(MUSCLES, rng.randint(1, 3)),
+            'equipment_needed': rng.sample(EQUIPMENT, rng.randint(1, 2)),
+            'instructions': None
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exercises', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    exercises = list(catalog(args.exercises, rng))
+    index = SearchIndex()
+
+    start = time.perf_counter()
+    index.add_many(exercises)
+    print(f'Indexed {len(index)} exercises in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    timings = []
+    for n in range(args.queries):
+        query = QUERIES[n % len(QUERIES)]
+        start = time.perf_counter()
+        index.search(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f'Search: p50 {statistics.median(timings):.3f} ms, '
+          f'p95 {timings[int(len(timings) * 0.95)]:.3f} ms, max {timings[-1]:.3f} ms')
+
+    start = time.perf_counter()
+    index.add(dict(exercises[0], name='Renamed Landmine Press'))
+    print(f'Incremental update of one exercise: {(time.perf_counter() - start) * 1000:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
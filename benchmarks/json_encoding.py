@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+JSON encode time and bytes on the wire for the largest API responses.
+
+Seeds a scratch SQLite database through the API (one user with --workouts
+logged workouts), builds the payloads of /api/workouts/history (full and
+compact pages) and /api/workouts/templates, then times FastJSONProvider with
+orjson and with the standard-library fallback, and reports the body size
+uncompressed, gzipped and (when the brotli package is installed) brotli'd,
+with the time each compression takes.
+
+    python benchmarks/json_encoding.py --workouts 200 --per-page 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp.name, 'encoding.db')}"
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.pop('GOOGLE_API_KEY', None)
+
+import encoding
+from app import create_app, init_db, _compact_workouts
+from models import User
+from queries import workout_history_query, template_query
+
+
+def seed(client, workouts):
+    token = client.post('/api/register', json={
+        'email': 'encoding@example.com', 'password': 'secret', 'name': 'Encoding'
+    }).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    for start in range(0, workouts, 100):
+        client.post('/api/workouts/bulk', headers=headers, json=[{
+            'date': f'2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}T{n % 24:02d}:00:00',
+            'template_id': n % 2 + 1,
+            'duration_minutes': 50,
+            'notes': 'Felt strong' if n % 3 else None,
+            'sets': [{'exercise_id': n % 8 + 1 + (s // 3), 'set_number': s % 3 + 1,
+                      'weight': 60 + s * 2.5, 'reps': 8, 'rpe': 8} for s in range(12)]
+        } for n in range(start, min(start + 100, workouts))])
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workouts', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app()
+    init_db(app)
+    seed(app.test_client(), args.workouts)
+
+    with app.app_context():
+        user_id = User.query.filter_by(email='encoding@example.com').one().id
+        workouts = workout_history_query(user_id).limit(args.per_page).all()
+        payloads = {
+            'history': {'workouts': [workout.to_dict() for workout in workouts]},
+            'history (compact)': _compact_workouts(workouts),
+            'templates': {'templates': [template.to_dict() for template in template_query().all()]}
+        }
+
+        fast = encoding.orjson
+        print(f"{'payload':<18} {'encoder':<8} {'encode':>9} {'bytes':>9} {'gzip':>16} {'brotli':>16}")
+        for name, payload in payloads.items():
+            for label, backend in (('json', None), ('orjson', fast)):
+                if label == 'orjson' and fast is None:
+                    continue
+                encoding.orjson = backend
+                body, encode_ms = timed(lambda: app.json.dumps(payload).encode('utf-8'), args.repeat)
+                gzipped, gzip_ms = timed(lambda: encoding._compress(body, 'gzip'), max(args.repeat // 10, 1))
+                line = f'{name:<18} {label:<8} {encode_ms:>7.3f}ms {len(body):>9} ' \
+                       f'{len(gzipped):>7} {gzip_ms:>6.2f}ms'
+                if encoding.brotli is not None:
+                    brotlied, brotli_ms = timed(lambda: encoding._compress(body, 'br'), max(args.repeat // 10, 1))
+                    line += f' {len(brotlied):>7} {brotli_ms:>6.2f}ms'
+                else:
+                    line += f" {'n/a':>16}"
+                print(line)
+        encoding.orjson = fast
+
+
+if __name__ == '__main__':
+    main()
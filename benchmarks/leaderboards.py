@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Leaderboard lookup cost as the number of ranked users grows.
+
+For each board size it fills a scratch SQLite database with that many users
+scored on this week's volume board, then times GET /api/leaderboards/volume
+(top 10 plus the caller's rank) for users spread across the board: once with
+a cold rank snapshot and repeatedly with a warm one. The last column is the
+live alternative, ranking the caller with a COUNT over the board, for
+comparison. Exits non-zero if the warm median at the largest size is more than
+--max-growth times the one at the smallest.
+
+    python benchmarks/leaderboards.py --sizes 1000,10000,100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.pop('GOOGLE_API_KEY', None)
+
+from datetime import datetime
+from sqlalchemy import func, insert, select
+from flask_jwt_extended import create_access_token
+import leaderboards
+from app import create_app, init_db
+from models import db, LeaderboardEntry, User
+
+
+def fill(app, users, rng):
+    start = leaderboards.period_start('week', datetime.utcnow())
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'email': f'rank{n}@example.com', 'password_hash': '-', 'name': f'Rank {n}'} for n in range(users)
+        ])
+        ids = db.session.scalars(select(User.id)).all()
+        db.session.execute(insert(LeaderboardEntry), [
+            {'period': 'week', 'period_start': start, 'metric': 'volume', 'exercise_id': 0,
+             'user_id': user_id, 'value': round(rng.lognormvariate(9, 1), 1)} for user_id in ids
+        ])
+        db.session.commit()
+        return ids, start
+
+
+def time_ms(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def measure(size, samples, rng):
+    leaderboards._snapshots.clear()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(_tmp.name, f'board{size}.db')}"})
+    init_db(app)
+    ids, start = fill(app, size, rng)
+    client = app.test_client()
+    with app.app_context():
+        tokens = {user_id: create_access_token(identity=user_id) for user_id in rng.sample(ids, min(samples, size))}
+
+    def get(user_id):
+        response = client.get('/api/leaderboards/volume', headers={'Authorization': f'Bearer {tokens[user_id]}'})
+        assert response.status_code == 200 and response.get_json()['me'], response.status_code
+
+    callers = list(tokens)
+    cold = time_ms(lambda: get(callers[0]))
+    warm = [time_ms(lambda: get(user_id)) for user_id in callers]
+
+    board = (LeaderboardEntry.period == 'week', LeaderboardEntry.period_start == start,
+             LeaderboardEntry.metric == 'volume', LeaderboardEntry.exercise_id == 0)
+
+    def live_rank(user_id):
+        with app.app_context():
+            mine = db.session.get(LeaderboardEntry, ('week', start, 'volume', 0, user_id)).value
+            db.session.scalar(select(func.count()).where(*board, LeaderboardEntry.value > mine))
+
+    live = [time_ms(lambda: live_rank(user_id)) for user_id in callers]
+    return cold, statistics.median(warm), statistics.median(live)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated ranked users per board')
+    parser.add_argument('--samples', type=int, default=50, help='callers timed per size')
+    parser.add_argument('--max-growth', type=float, default=3.0)
+    args = parser.parse_args()
+
+    rng = random.Random(25)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"{'users':>8}  {'cold':>9}  {'warm p50':>9}  {'COUNT rank p50':>14}")
+    results = {}
+    for size in sizes:
+        cold, warm, live = measure(size, args.samples, rng)
+        results[size] = warm
+        print(f'{size:>8}  {cold:>7.2f}ms  {warm:>7.2f}ms  {live:>12.2f}ms')
+
+    growth = results[sizes[-1]] / results[sizes[0]]
+    print(f'Warm lookup grew {growth:.1f}x from {sizes[0]} to {sizes[-1]} users')
+    if growth > args.max_growth:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Load test for the whole API against a synthetic history.
+
+Seeds a scratch SQLite database with users whose training habits follow a
+long-tailed distribution (most train a couple of times a week, a few daily)
+over several years of workouts and sets, then runs concurrent clients through
+the Flask app performing a weighted mix of register, login, log, history,
+templates, exercises, stats and tips calls. Tips use the offline StubModel,
+so nothing leaves the machine.
+
+For each endpoint it reports p50/p95/p99 latency, throughput and SQL
+statements per request (read from the Server-Timing header), then compares
+p95 latency and statements per request with benchmarks/baseline.json and exits
+non-zero on a regression. Statement counts depend on the seeded data (e.g. how
+many users already have a history), so they are only compared, within half a
+statement, when the run uses the baseline's --users/--years/--clients/
+--requests; latency also gets a tolerance because machines differ. With any
+other configuration only error rates are compared. Every derived table is
+built while seeding, so no request pays for building a user's first row.
+
+    python benchmarks/load.py                          # run and compare
+    python benchmarks/load.py --update-baseline        # record a new baseline
+    python benchmarks/load.py --db /tmp/load.db        # reuse a seeded database
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+PASSWORD = 'load-test-password'
+SEED = 1234
+
+# Relative frequency of each call in the client mix
+MIX = {
+    'history': 30,
+    'history_cursor': 15,
+    'workout_detail': 10,
+    'log_workout': 12,
+    'stats': 10,
+    'templates': 8,
+    'exercises': 6,
+    'tips': 5,
+    'login': 2,
+    'register': 2,
+}
+
+_DB_STATEMENTS = re.compile(r'db;dur=[\d.]+;desc="(\d+) statements"')
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def seed_history(app, users, years, rng):
+    """Bulk-insert users and their workout history, then build derived tables"""
+    from sqlalchemy import insert
+    from models import db, User, UserStats, WorkoutLog, SetLog, TemplateExercise
+    from analytics import backfill_statement as weekly_stats_backfill
+    from records import backfill_statement as personal_records_backfill
+    from leaderboards import backfill_statements as leaderboard_backfill
+
+    with app.app_context():
+        password_hash = User(email='', name='')
+        password_hash.set_password(PASSWORD)
+        password_hash = password_hash.password_hash
+
+        templates = {}
+        for slot in TemplateExercise.query.order_by(TemplateExercise.order):
+            templates.setdefault(slot.template_id, []).append((slot.exercise_id, slot.sets))
+
+        now = datetime.utcnow()
+        user_rows = [{'email': f'load{n}@example.com', 'password_hash': password_hash, 'name': f'Load {n}',
+                      'goals': ['strength'], 'schedule': '3-4 days/week', 'equipment': ['barbell', 'dumbbells'],
+                      'experience_level': 'intermediate', 'onboarding_completed': True,
+                      'created_at': now - timedelta(days=365 * years)} for n in range(users)]
+        user_ids = db.session.execute(insert(User).returning(User.id, sort_by_parameter_order=True),
+                                      user_rows).scalars().all()
+
+        workouts = sets = 0
+        for user_id in user_ids:
+            # Weekly frequency is log-normal: median ~2.5, a long tail of daily
+            # trainers. Most accounts are recent, a few go back the full span.
+            per_week = min(max(rng.lognormvariate(0.9, 0.5), 0.3), 7)
+            tenure_days = max(7, int(365 * years * rng.random() ** 2))
+            count = int(per_week * tenure_days / 7)
+            start = now - timedelta(days=tenure_days)
+            dates = sorted(start + timedelta(seconds=rng.randint(0, tenure_days * 86400)) for _ in range(count))
+
+            workout_rows = []
+            for date in dates:
+                template_id = rng.choice(list(templates))
+                workout_rows.append({'user_id': user_id, 'template_id': template_id, 'date': date,
+                                     'duration_minutes': rng.randint(30, 90)})
+            if not workout_rows:
+                continue
+            workout_ids = db.session.execute(
+                insert(WorkoutLog).returning(WorkoutLog.id, sort_by_parameter_order=True), workout_rows
+            ).scalars().all()
+
+            set_rows = []
+            for workout_id, workout in zip(workout_ids, workout_rows):
+                progress = 1 + (workout['date'] - start).days / 365 * 0.15
+                for exercise_id, planned_sets in templates[workout['template_id']]:
+                    base = 20 + exercise_id * 5
+                    for number in range(1, planned_sets + 1):
+                        set_rows.append({'workout_log_id': workout_id, 'exercise_id': exercise_id,
+                                         'set_number': number, 'weight': round(base * progress * rng.uniform(0.9, 1.1), 1),
+                                         'reps': rng.randint(5, 12), 'rpe': rng.choice([7, 7.5, 8, 8.5, 9])})
+            db.session.execute(insert(SetLog), set_rows)
+            workouts += len(workout_rows)
+            sets += len(set_rows)
+
+        db.session.execute(weekly_stats_backfill(db.engine.dialect.name))
+        db.session.execute(personal_records_backfill())
+        for statement in leaderboard_backfill(db.engine.dialect.name):
+            db.session.execute(statement)
+        for user_id in user_ids:
+            UserStats.for_user(user_id)
+        db.session.commit()
+    return len(user_ids), workouts, sets
+
+
+class Client(threading.Thread):
+    """One simulated user session issuing requests from the mix"""
+
+    def __init__(self, app, users, requests, rng, results, lock):
+        super().__init__()
+        self.client = app.test_client()
+        self.users = users
+        self.requests = requests
+        self.rng = rng
+        self.results = results
+        self.lock = lock
+        self.headers = None
+        self.workout_ids = []
+
+    def call(self, name, method, url, **kwargs):
+        headers = dict(kwargs.pop('headers', self.headers) or {}, **{'X-Server-Timing': '1'})
+        start = time.perf_counter()
+        response = getattr(self.client, method)(url, headers=headers, **kwargs)
+        # Back off like a real client when password hashing is saturated; the wait counts as latency
+        while response.status_code == 429 and 'Retry-After' in response.headers:
+            time.sleep(int(response.headers['Retry-After']))
+            response = getattr(self.client, method)(url, headers=headers, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        match = _DB_STATEMENTS.search(response.headers.get('Server-Timing', ''))
+        with self.lock:
+            result = self.results.setdefault(name, {'latency': [], 'statements': [], 'errors': 0})
+            result['latency'].append(elapsed)
+            result['statements'].append(int(match.group(1)) if match else 0)
+            if response.status_code >= 400:
+                result['errors'] += 1
+        return response
+
+    def login(self):
+        email = f'load{self.rng.randrange(self.users)}@example.com'
+        response = self.call('login', 'post', '/api/login', json={'email': email, 'password': PASSWORD}, headers={})
+        self.headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+        self.workout_ids = []
+
+    def run(self):
+        self.login()
+        names, weights = zip(*MIX.items())
+        for _ in range(self.requests):
+            getattr(self, 'do_' + self.rng.choices(names, weights)[0])()
+
+    def do_login(self):
+        self.login()
+
+    def do_register(self):
+        email = f'new-{threading.get_ident()}-{self.rng.random()}@example.com'
+        self.call('register', 'post', '/api/register', json={'email': email, 'password': PASSWORD, 'name': 'New'}, headers={})
+
+    def do_history(self):
+        page = self.rng.choice([1, 1, 1, 2, 3])
+        data = self.call('history', 'get', f'/api/workouts/history?page={page}&per_page=10').get_json()
+        self.workout_ids = [w['id'] for w in data.get('workouts', [])] or self.workout_ids
+
+    def do_history_cursor(self):
+        data = self.call('history_cursor', 'get', '/api/workouts/history?cursor=&limit=20&format=compact').get_json()
+        if data.get('next_cursor'):
+            self.call('history_cursor', 'get', f"/api/workouts/history?cursor={data['next_cursor']}&limit=20&format=compact")
+
+    def do_workout_detail(self):
+        if not self.workout_ids:
+            return self.do_history()
+        self.call('workout_detail', 'get', f'/api/workouts/{self.rng.choice(self.workout_ids)}')
+
+    def do_log_workout(self):
+        sets = [{'exercise_id': exercise_id, 'set_number': n, 'weight': self.rng.randint(40, 140), 'reps': self.rng.randint(5, 12), 'rpe': 8}
+                for exercise_id in self.rng.sample(range(1, 17), 4) for n in range(1, 4)]
+        self.call('log_workout', 'post', '/api/workouts/log', json={'template_id': 1, 'duration_minutes': 60, 'sets': sets})
+
+    def do_stats(self):
+        self.call('stats', 'get', '/api/workouts/stats')
+
+    def do_templates(self):
+        self.call('templates', 'get', '/api/workouts/templates')
+
+    def do_exercises(self):
+        self.call('exercises', 'get', self.rng.choice(['/api/exercises', '/api/exercises?category=push',
+                                                       '/api/exercises?equipment=barbell,bench']))
+
+    def do_tips(self):
+        self.call('tips', 'post', '/api/ai/profile-tips', json={})
+
+
+def compare(report, baseline, latency_tolerance, same_config=True):
+    """Regressions of this run against the stored baseline"""
+    problems = []
+    for name, base in baseline.get('endpoints', {}).items():
+        current = report.get(name)
+        if current is None:
+            continue
+        if same_config and current['statements_per_request'] > base['statements_per_request'] + 0.5:
+            problems.append(f"{name}: {current['statements_per_request']:.1f} SQL statements/request, "
+                            f"baseline {base['statements_per_request']:.1f}")
+        # The absolute floor keeps millisecond-level noise from failing fast endpoints
+        allowed = max(base['p95_ms'] * (1 + latency_tolerance), base['p95_ms'] + 5)
+        if same_config and current['p95_ms'] > allowed:
+            problems.append(f"{name}: p95 {current['p95_ms']:.1f} ms, baseline {base['p95_ms']:.1f} ms")
+        if current['error_rate'] > base.get('error_rate', 0) + 0.01:
+            problems.append(f"{name}: {current['error_rate']:.1%} errors")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent client threads')
+    parser.add_argument('--requests', type=int, default=250, help='requests per client')
+    parser.add_argument('--db', help='database file to reuse; seeded only if it does not exist')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                        help='allowed p95 slowdown as a fraction of the baseline (default 0.5)')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    path = args.db or os.path.join(tmp.name, 'load.db')
+    fresh = not os.path.exists(path)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['AI_TIPS_MODEL'] = 'stub'
+    # Every client may be hashing at once; measure their latency rather than the 429 backpressure
+    os.environ.setdefault('PASSWORD_HASH_QUEUE', str(args.clients))
+    os.environ.pop('GOOGLE_API_KEY', None)
+
+    from app import create_app, init_db
+    from jobs import worker_pool
+    app = create_app()
+    init_db(app)
+    rng = random.Random(SEED)
+    if fresh:
+        start = time.perf_counter()
+        users, workouts, sets = seed_history(app, args.users, args.years, rng)
+        print(f'Seeded {users} users, {workouts} workouts, {sets} sets in {time.perf_counter() - start:.1f}s')
+
+    results = {}
+    lock = threading.Lock()
+    clients = [Client(app, args.users, args.requests, random.Random(SEED + n), results, lock)
+               for n in range(args.clients)]
+    # Background jobs compete with requests for the database, as in production
+    worker_pool.start(app)
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    wall = time.perf_counter() - start
+    worker_pool.stop()
+
+    report = {}
+    print(f"\n{'endpoint':<16}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'sql/req':>9}{'errors':>8}")
+    for name in sorted(results):
+        result = results[name]
+        count = len(result['latency'])
+        report[name] = {
+            'p50_ms': round(percentile(result['latency'], 50), 2),
+            'p95_ms': round(percentile(result['latency'], 95), 2),
+            'p99_ms': round(percentile(result['latency'], 99), 2),
+            'throughput_rps': round(count / wall, 1),
+            'statements_per_request': round(sum(result['statements']) / count, 2),
+            'error_rate': round(result['errors'] / count, 4)
+        }
+        row = report[name]
+        print(f"{name:<16}{count:>7}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+              f"{row['throughput_rps']:>9.1f}{row['statements_per_request']:>9.1f}{result['errors']:>8}")
+    total = sum(len(r['latency']) for r in results.values())
+    print(f'\n{total} requests from {args.clients} clients in {wall:.1f}s: {total / wall:.1f} req/s')
+
+    config = {key: getattr(args, key) for key in ('users', 'years', 'clients', 'requests')}
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'config': config, 'endpoints': report}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline written to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print('No baseline to compare against; run with --update-baseline')
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    same_config = baseline.get('config') == config
+    if not same_config:
+        print(f"Baseline was recorded with {baseline.get('config')}; comparing error rates only")
+    problems = compare(report, baseline, args.latency_tolerance, same_config=same_config)
+    for problem in problems:
+        print('REGRESSION ' + problem)
+    if problems:
+        sys.exit(1)
+    print('No regressions against baseline')
+
+
+if __name__ == '__main__':
+    main()
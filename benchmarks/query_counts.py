@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Fail if a history page or workout detail issues more SQL as data grows.
+
+For each history size it registers a fresh user on a scratch SQLite database,
+uploads that many workouts (each with --sets sets) through /api/workouts/bulk,
+and counts the statements issued by a history page (full and compact), the
+next cursor page and one workout's detail. Every route must take the same
+number of statements at every size; an N+1 query shows up as a count that
+grows with the history, and the script exits non-zero.
+
+    python benchmarks/query_counts.py --sizes 1,10,100 --sets 12
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp.name, 'counts.db')}"
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.pop('GOOGLE_API_KEY', None)
+
+from sqlalchemy import event
+from app import create_app, init_db
+from models import db
+
+app = create_app()
+
+
+def seed(client, n, workouts, sets):
+    token = client.post('/api/register', json={
+        'email': f'counts{n}@example.com', 'password': 'secret', 'name': 'Counts'
+    }).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.post('/api/workouts/bulk', headers=headers, json=[{
+        'template_id': 1,
+        'sets': [{'exercise_id': 1 + s % 16, 'set_number': s + 1, 'weight': 60, 'reps': 8} for s in range(sets)]
+    } for _ in range(workouts)])
+    assert response.status_code == 200, response.get_json()
+    workout_id = response.get_json()['results'][0]['workout_id']
+    return headers, workout_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,10,100', help='comma-separated workouts per user')
+    parser.add_argument('--sets', type=int, default=12, help='sets per workout')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    init_db(app)
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    counts = {}
+    for n, size in enumerate(sizes):
+        headers, workout_id = seed(client, n, size, args.sets)
+        limit = max(size // 2, 1)
+        page = client.get(f'/api/workouts/history?cursor=&limit={limit}', headers=headers).get_json()
+        routes = {
+            'history': '/api/workouts/history',
+            'history compact': '/api/workouts/history?format=compact',
+            'history cursor': f"/api/workouts/history?cursor={page['next_cursor'] or ''}&limit={limit}",
+            'workout detail': f'/api/workouts/{workout_id}',
+        }
+        for name, url in routes.items():
+            statements.clear()
+            event.listen(engine, 'before_cursor_execute', count)
+            response = client.get(url, headers=headers)
+            event.remove(engine, 'before_cursor_execute', count)
+            assert response.status_code == 200, (url, response.status_code)
+            counts.setdefault(name, []).append(len(statements))
+
+    print(f"{'route':<18}" + ''.join(f'{size:>8}' for size in sizes) + '  (statements per request by workouts)')
+    growing = []
+    for name, row in counts.items():
+        print(f'{name:<18}' + ''.join(f'{c:>8}' for c in row))
+        if len(set(row)) > 1:
+            growing.append(name)
+    if growing:
+        print(f"Statement count depends on history size: {', '.join(growing)}")
+        sys.exit(1)
+    print('Statement counts are constant')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Fail if any API query falls back to a full table scan.
+
+Drives every route in app.py through the Flask test client against a scratch
+SQLite database, then drains the background jobs they queued. Each SELECT,
+UPDATE and DELETE the app issues is run through EXPLAIN QUERY PLAN. A filtered statement whose plan contains a bare "SCAN <table>" or a
+temporary B-tree for ORDER BY is reported, and the script exits non-zero.
+Unfiltered catalog listings read whole tables by design and are skipped.
+
+    python benchmarks/query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp.name, 'plans.db')}"
+os.environ.pop('GOOGLE_API_KEY', None)
+os.environ['ADMIN_TOKEN'] = 'plans'
+
+from sqlalchemy import event
+from app import create_app, init_db
+from models import db
+from jobs import prune, reclaim, run_one
+
+app = create_app()
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+FILTERED = re.compile(r'\bWHERE\b', re.IGNORECASE)
+
+
+def exercise_api(client):
+    """Hit every API route once with realistic data"""
+    token = client.post('/api/register', json={
+        'email': 'plans@example.com', 'password': 'secret', 'name': 'Plans'
+    }).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    client.post('/api/login', json={'email': 'plans@example.com', 'password': 'secret'})
+    client.get('/api/user/profile', headers=headers)
+    client.put('/api/user/onboarding', headers=headers, json={
+        'goals': ['strength'], 'schedule': '3-4 days/week', 'equipment': ['barbell'], 'experience_level': 'beginner'
+    })
+    client.get('/api/workouts/templates', headers=headers)
+    client.get('/api/exercises', headers=headers)
+    client.get('/api/exercises?category=push', headers=headers)
+    client.get('/api/exercises?equipment=barbell,bench&muscle=chest,triceps', headers=headers)
+    client.get('/api/exercises?category=legs&equipment=', headers=headers)
+    client.get('/api/exercises/search?q=benhc', headers=headers)
+    sets = [{'exercise_id': 1, 'set_number': n, 'weight': 60, 'reps': 8, 'rpe': 8} for n in range(1, 4)]
+    workout_id = client.post('/api/workouts/log', headers=headers, json={
+        'template_id': 1, 'duration_minutes': 45, 'sets': sets
+    }).get_json()['workout']['id']
+    client.post('/api/workouts/bulk', headers=headers, json=[
+        {'idempotency_key': f'plan-{n}', 'date': f'2024-01-{n:02d}T09:00:00', 'template_id': 1, 'sets': sets}
+        for n in range(1, 11)
+    ])
+    client.get('/api/workouts/history', headers=headers)
+    client.get('/api/workouts/history?format=compact', headers=headers)
+    page = client.get('/api/workouts/history?cursor=&limit=4&include_total=1', headers=headers).get_json()
+    client.get(f"/api/workouts/history?cursor={page['next_cursor']}&limit=4&format=compact", headers=headers)
+    client.get(f'/api/workouts/{workout_id}', headers=headers)
+    client.get('/api/workouts/export?format=csv', headers=headers).get_data()
+    client.get('/api/workouts/templates/1/next', headers=headers)
+    client.get('/api/workouts/stats', headers=headers)
+    client.get('/api/analytics/exercise/1', headers=headers)
+    client.get('/api/analytics/volume?weeks=520', headers=headers)
+    client.post('/api/ai/profile-tips', headers=headers, json={})
+    client.get('/api/leaderboards/workouts', headers=headers)
+    client.get('/api/leaderboards/volume?period=month', headers=headers)
+    client.get('/api/leaderboards/best_lift?exercise_id=1', headers=headers)
+    client.get('/api/admin/jobs', headers={'Authorization': 'Bearer plans'})
+
+    # What the job workers would run after those requests
+    with app.app_context():
+        while run_one():
+            pass
+        reclaim()
+        prune()
+
+
+def main():
+    init_db(app)
+    statements = []
+
+    with app.app_context():
+        engine = db.engine
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')) and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    exercise_api(app.test_client())
+    event.remove(engine, 'before_cursor_execute', capture)
+
+    problems = []
+    seen = set()
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            if statement in seen or not FILTERED.search(statement):
+                continue
+            seen.add(statement)
+            plan = [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+            bad = [step for step in plan if FULL_SCAN.match(step) or 'USE TEMP B-TREE FOR ORDER BY' in step]
+            if bad:
+                problems.append((statement, plan))
+
+    print(f'Checked {len(seen)} distinct filtered queries')
+    for statement, plan in problems:
+        print('\nFull scan in:\n  ' + ' '.join(statement.split()))
+        for step in plan:
+            print(f'    {step}')
+    if problems:
+        sys.exit(1)
+    print('No full table scans')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Startup cost of a fresh server process, split into its phases.
+
+Each run is a new interpreter against an already initialized scratch SQLite
+database (init_db() is a once-per-deployment step, see cold_start.py). It
+times importing app.py, building the app with create_app() and serving the
+first authenticated request (the exercise catalog: first connection, first
+query, first render). It also reports whether the Gemini client library was
+loaded, which should only happen once a tip is generated with GOOGLE_API_KEY
+set. Exits non-zero if the median worker boot (create_app() plus the first
+request) exceeds --budget-ms.
+
+    python benchmarks/startup.py --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SETUP = """
+from app import create_app, init_db
+init_db(create_app())
+"""
+
+BOOT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+from flask_jwt_extended import create_access_token
+with app.app_context():
+    token = create_access_token(identity=1)
+token_done = time.perf_counter()
+response = app.test_client().get('/api/exercises', headers={'Authorization': f'Bearer {token}'})
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - token_done) * 1000,
+    'ai_client_loaded': 'google.generativeai' in sys.modules
+}))
+"""
+
+
+def run(code, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return result.stdout, (time.perf_counter() - start) * 1000
+
+
+def boot(env):
+    stdout, wall_ms = run(BOOT, env)
+    return dict(json.loads(stdout.strip().splitlines()[-1]), wall_ms=wall_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget-ms', type=float, default=200,
+                        help='allowed median create_app() + first request time (default 200)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}", AI_TIPS_MODEL='')
+        env.pop('GOOGLE_API_KEY', None)
+        run(SETUP, env)
+
+        print(f"{'run':>3}  {'import':>9}  {'create_app':>10}  {'1st request':>11}  {'process':>9}  ai client")
+        runs = []
+        for n in range(1, args.runs + 1):
+            result = boot(env)
+            runs.append(result)
+            print(f"{n:>3}  {result['import_ms']:>7.1f}ms  {result['create_app_ms']:>8.1f}ms  "
+                  f"{result['first_request_ms']:>9.1f}ms  {result['wall_ms']:>7.1f}ms  "
+                  f"{'loaded' if result['ai_client_loaded'] else 'not loaded'}")
+
+    def median(key):
+        return statistics.median(result[key] for result in runs)
+
+    worker_boot = median('create_app_ms') + median('first_request_ms')
+    print(f"Median: import {median('import_ms'):.1f} ms, worker boot {worker_boot:.1f} ms "
+          f"(create_app {median('create_app_ms'):.1f} ms + first request {median('first_request_ms'):.1f} ms)")
+    if worker_boot > args.budget_ms:
+        print(f'Worker boot exceeds the {args.budget_ms:.0f} ms budget')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+In-process cache for rendered catalog responses (exercises and templates).
+
+The catalog changes only when Exercise, WorkoutTemplate or TemplateExercise
+rows are written, so responses are rendered once and reused until a commit
+touching one of those models bumps the catalog version. Each entry carries an
+ETag derived from the body, letting browsers revalidate with If-None-Match and
+get a 304 instead of the payload.
+
+Other in-process views of the catalog (the exercise search index) register
+with on_catalog_change() and are told which exercises each commit touched.
+
+The version lives in process memory: catalog writes happen during seeding,
+before serving workers start, so every worker begins from the same catalog.
+"""
+import hashlib
+import threading
+from flask import current_app, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Exercise, WorkoutTemplate, TemplateExercise
+
+CATALOG_MODELS = (Exercise, WorkoutTemplate, TemplateExercise)
+MAX_ENTRIES = 256  # Bounds memory if clients send arbitrary filter values
+
+_lock = threading.Lock()
+_version = 0
+_entries = {}  # key -> (version, body, etag)
+_listeners = []
+
+
+def catalog_version():
+    return _version
+
+
+def on_catalog_change(listener):
+    """Call listener(exercise_ids) after each committed catalog write
+
+    exercise_ids is the set of exercises written, or None when the whole
+    catalog may have changed (an explicit bump_catalog_version()).
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def bump_catalog_version(exercise_ids=None):
+    """Invalidate every cached catalog response"""
+    global _version
+    with _lock:
+        _version += 1
+        _entries.clear()
+    for listener in _listeners:
+        listener(exercise_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_catalog_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info['catalog_changed'] = True
+            if isinstance(obj, Exercise):
+                session.info.setdefault('catalog_exercises', set()).add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    # Bump only once the write is visible, otherwise a concurrent reader could
+    # cache the old rows under the new version
+    exercise_ids = session.info.pop('catalog_exercises', set())
+    if session.info.pop('catalog_changed', False):
+        bump_catalog_version(exercise_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('catalog_changed', None)
+    session.info.pop('catalog_exercises', None)
+
+
+def cached_catalog_response(key, render):
+    """Serve render()'s payload as JSON, re-rendering only after catalog writes"""
+    version = _version
+    entry = _entries.get(key)
+    if entry is None or entry[0] != version:
+        body = jsonify(render()).get_data()
+        entry = (version, body, hashlib.sha1(body).hexdigest())
+        with _lock:
+            if len(_entries) >= MAX_ENTRIES:
+                _entries.clear()
+            _entries[key] = entry
+
+    _, body, etag = entry
+    # Weak comparison, as If-None-Match specifies: compressed copies carry W/"etag"
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Authenticated, so keep it out of shared caches but let browsers revalidate
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
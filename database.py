@@ -0,0 +1,86 @@
+"""
+Database engine configuration.
+
+The database URI comes from DATABASE_URL (default: the SQLite file in the
+instance folder), so the same app can run against PostgreSQL. Pools are sized
+for the serving model in serve.py, where each worker process handles up to
+WEB_THREADS requests at once.
+
+SQLite connections are tuned as they are opened:
+    journal_mode=WAL      readers no longer block behind a writer's commit
+    busy_timeout          writers wait for the lock instead of failing at once
+    synchronous=NORMAL    fsync at checkpoints rather than every commit (safe with WAL)
+    mmap_size/cache_size  keep hot pages in memory
+"""
+import os
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+DEFAULT_DATABASE_URI = 'sqlite:///fitness_tracker.db'
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+
+
+def database_uri():
+    uri = os.getenv('DATABASE_URL', DEFAULT_DATABASE_URI)
+    # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(uri):
+    """Pool settings matched to the number of request threads per worker"""
+    threads = int(os.getenv('WEB_THREADS', 4))
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        return {}  # Flask-SQLAlchemy shares a single connection for in-memory databases
+    if uri.startswith('sqlite'):
+        # Writes serialize on the file lock anyway, so one connection per thread suffices
+        return {
+            'pool_size': threads,
+            'max_overflow': threads,
+            'connect_args': {'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+        }
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', threads)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', threads)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+    cursor.close()
+
+
+def tune_engine(engine):
+    """Apply per-connection tuning to an engine's future connections"""
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', apply_sqlite_pragmas)
+
+
+def dialect_insert(model):
+    """INSERT construct for the bound database, with on_conflict_do_update() support"""
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def configure_database(app, db):
+    """Point the app at DATABASE_URL, bind db to it and tune its engine"""
+    uri = database_uri()
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', uri)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    db.init_app(app)
+    with app.app_context():
+        tune_engine(db.engine)
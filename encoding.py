@@ -0,0 +1,133 @@
+"""
+Response encoding: a faster JSON provider and negotiated compression.
+
+FastJSONProvider uses orjson when it is installed and the standard library
+otherwise. Either way dates and datetimes are written as ISO 8601 strings, so
+models hand them over as-is instead of formatting them in every to_dict().
+
+Responses of at least COMPRESS_MIN_SIZE bytes are compressed with brotli (if
+the `brotli` package is installed) or gzip, whichever the client's
+Accept-Encoding prefers. Compressed bodies that carry an ETag (the cached
+catalog responses) are kept, so an unchanged catalog is compressed only once,
+and their ETag is made weak as the bytes differ from the identity encoding.
+Streamed responses (exports) are left alone.
+
+Configuration (environment variables):
+    COMPRESS_MIN_SIZE    smallest body worth compressing, in bytes (default 1024)
+    COMPRESS_LEVEL       gzip level (default 6)
+    BROTLI_QUALITY       brotli quality (default 4; higher is much slower)
+"""
+import datetime
+import gzip
+import json
+import os
+from flask.json.provider import DefaultJSONProvider
+from flask import request
+from ttl_cache import TTLCache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def _default(obj):
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, falling back to the json module"""
+
+    def _pretty(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self._pretty():
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_default, option=self._orjson_options()).decode('utf-8')
+        kwargs.setdefault('default', _default)
+        if self._pretty():
+            kwargs.setdefault('indent', 2)
+        else:
+            kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # Skip the bytes -> str -> bytes round trip of the default provider
+        body = orjson.dumps(obj, default=_default, option=self._orjson_options())
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+
+def _compressible(response):
+    return (
+        200 <= response.status_code < 300
+        and response.status_code != 204
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and 'Content-Encoding' not in response.headers
+        and (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def init_encoding(app):
+    """Install FastJSONProvider and the compression hook on `app`"""
+    app.json = FastJSONProvider(app)
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    compressed_bodies = TTLCache(max_entries=256, ttl=3600)  # (etag, encoding) -> bytes
+
+    @app.after_request
+    def compress_response(response):
+        if not _compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.content_length is None or response.content_length < COMPRESS_MIN_SIZE:
+            return response
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag else None
+        data = compressed_bodies.get(key) if key else None
+        if data is None:
+            data = _compress(response.get_data(), encoding)
+            if key:
+                compressed_bodies.set(key, data)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
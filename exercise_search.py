@@ -0,0 +1,268 @@
+"""
+In-memory search over the exercise catalog.
+
+Exercise names, muscle groups and equipment are tokenized into an inverted
+index held in process memory. A query term matches index terms that equal it,
+start with it (so "ben" finds "bench") or are within one or two edits of it or
+of one of its prefixes (so "benhc" and "dumbel" still match). Typo candidates
+come from a symmetric-delete table, so a lookup never compares the query
+against the whole vocabulary.
+Results are ranked by match quality weighted by field, name hits first.
+
+The index mirrors the database rather than replacing it. catalog_cache reports
+which exercises each committed write touched, and the next search re-reads
+just those rows before answering.
+"""
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from catalog_cache import on_catalog_change
+from models import Exercise
+
+# A hit in the name outranks a muscle group hit, which outranks equipment
+FIELD_WEIGHTS = {'name': 3.0, 'muscle': 2.0, 'equipment': 1.0}
+EXACT, PREFIX, FUZZY = 1.0, 0.75, 0.5
+MAX_EDITS = 2
+MIN_FUZZY_LENGTH = 4  # Shorter query terms must match exactly or as a prefix
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase alphanumeric words; 'pull_up_bar' -> ['pull', 'up', 'bar']"""
+    return _TOKEN.findall((text or '').lower())
+
+
+def allowed_edits(term):
+    """Typos tolerated for a query term of this length"""
+    if len(term) < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if len(term) < 8 else MAX_EDITS
+
+
+def _deletes(term, depth):
+    """Every string reachable from `term` by removing up to `depth` characters"""
+    found = {term}
+    frontier = {term}
+    for _ in range(depth):
+        frontier = {t[:i] + t[i + 1:] for t in frontier for i in range(len(t))}
+        found |= frontier
+    return found
+
+
+def _term_variants(term):
+    """Deletion variants of a term and of its prefixes, for typo lookups"""
+    variants = set()
+    for length in range(min(MIN_FUZZY_LENGTH, len(term)), len(term) + 1):
+        variants |= _deletes(term[:length], MAX_EDITS)
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Inverted index with prefix and typo-tolerant term matching
+
+    Documents are exercise dicts as returned by Exercise.to_dict(). Not
+    thread-safe on its own; ExerciseSearch serializes writers.
+    """
+
+    def __init__(self):
+        self.documents = {}   # exercise id -> exercise dict
+        self._doc_terms = {}  # exercise id -> {term: weight}
+        self._names = {}      # exercise id -> normalized name, for tie-breaks
+        self._postings = {}   # term -> {exercise id: weight}
+        self._vocabulary = []  # sorted terms, for prefix ranges
+        self._delete_map = {}  # deletion variant -> terms it came from
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, exercise):
+        """Index an exercise dict, replacing any earlier version of it"""
+        self.add_many([exercise])
+
+    def add_many(self, exercises):
+        for exercise in exercises:
+            self._add(exercise)
+        self._vocabulary = sorted(self._postings)
+
+    def remove(self, exercise_id):
+        self._remove(exercise_id)
+        self._vocabulary = sorted(self._postings)
+
+    def _add(self, exercise):
+        self._remove(exercise['id'])
+        terms = {}
+        fields = (
+            ('name', [exercise.get('name')]),
+            ('muscle', exercise.get('muscle_groups') or []),
+            ('equipment', exercise.get('equipment_needed') or [])
+        )
+        for field, values in fields:
+            for value in values:
+                for term in tokenize(value):
+                    terms[term] = max(terms.get(term, 0), FIELD_WEIGHTS[field])
+
+        self.documents[exercise['id']] = exercise
+        self._doc_terms[exercise['id']] = terms
+        self._names[exercise['id']] = ' '.join(tokenize(exercise.get('name')))
+        for term, weight in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                for variant in _term_variants(term):
+                    self._delete_map.setdefault(variant, set()).add(term)
+            postings[exercise['id']] = weight
+
+    def _remove(self, exercise_id):
+        terms = self._doc_terms.pop(exercise_id, None)
+        if terms is None:
+            return
+        del self.documents[exercise_id]
+        del self._names[exercise_id]
+        for term in terms:
+            postings = self._postings[term]
+            del postings[exercise_id]
+            if not postings:
+                del self._postings[term]
+                for variant in _term_variants(term):
+                    sources = self._delete_map[variant]
+                    sources.discard(term)
+                    if not sources:
+                        del self._delete_map[variant]
+
+    def clear(self):
+        self.__init__()
+
+    def matching_terms(self, query_term):
+        """{index term: match quality} for one query term"""
+        matches = {}
+        if query_term in self._postings:
+            matches[query_term] = EXACT
+
+        vocabulary = self._vocabulary
+        position = bisect_left(vocabulary, query_term)
+        while position < len(vocabulary) and vocabulary[position].startswith(query_term):
+            term = vocabulary[position]
+            position += 1
+            # Closer completions rank higher: "row" prefers "rows" to "rowing"
+            matches.setdefault(term, PREFIX * len(query_term) / len(term))
+
+        edits = allowed_edits(query_term)
+        if edits:
+            candidates = set()
+            for variant in _deletes(query_term, edits):
+                candidates |= self._delete_map.get(variant, set())
+            for term in candidates:
+                if term in matches:
+                    continue
+                distance = edit_distance(query_term, term, edits)
+                if distance <= edits:
+                    matches[term] = FUZZY / distance
+                    continue
+                # A typo in a word still being typed: "dumbel" -> "dumbbells"
+                distance = min(
+                    edit_distance(query_term, term[:length], edits)
+                    for length in range(len(query_term) - edits, min(len(query_term) + edits, len(term)) + 1)
+                )
+                if distance <= edits:
+                    matches[term] = FUZZY * PREFIX / max(distance, 1)
+        return matches
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Exercises matching every query term, best first, each with a score"""
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+
+        scores = None
+        for query_term in query_terms:
+            term_scores = {}
+            for term, quality in self.matching_terms(query_term).items():
+                for exercise_id, weight in self._postings[term].items():
+                    score = quality * weight
+                    if score > term_scores.get(exercise_id, 0):
+                        term_scores[exercise_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {i: s + term_scores[i] for i, s in scores.items() if i in term_scores}
+            if not scores:
+                return []
+
+        phrase = ' '.join(query_terms)
+        names = self._names
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (
+            -item[1],
+            not names[item[0]].startswith(phrase),
+            len(names[item[0]]),
+            item[0]
+        ))
+        return [dict(self.documents[i], score=round(s, 3)) for i, s in ranked]
+
+
+class ExerciseSearch:
+    """SearchIndex kept in step with the exercise table"""
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._pending = set()  # exercise ids written since the last refresh
+
+    def invalidate(self, exercise_ids=None):
+        """Mark exercises for re-reading; None means the whole catalog"""
+        with self._lock:
+            if exercise_ids is None:
+                self._loaded = False
+                self._pending.clear()
+            else:
+                self._pending |= set(exercise_ids)
+
+    def refresh(self):
+        """Bring the index up to date; call inside an app context"""
+        with self._lock:
+            if not self._loaded:
+                self.index.clear()
+                self.index.add_many(exercise.to_dict() for exercise in Exercise.query.all())
+                self._loaded = True
+                self._pending.clear()
+            elif self._pending:
+                ids = self._pending
+                self._pending = set()
+                found = Exercise.query.filter(Exercise.id.in_(ids)).all()
+                self.index.add_many(exercise.to_dict() for exercise in found)
+                # Whatever is no longer in the table was deleted
+                for exercise_id in ids - {exercise.id for exercise in found}:
+                    self.index.remove(exercise_id)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        if not self._loaded or self._pending:
+            self.refresh()
+        with self._lock:
+            return self.index.search(query, limit)
+
+
+exercise_search = ExerciseSearch()
+on_catalog_change(exercise_search.invalidate)
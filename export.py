@@ -0,0 +1,148 @@
+"""
+Streaming export of a user's full workout history.
+
+Rows come straight off a cursor (yield_per, a server-side cursor on
+PostgreSQL) in history order and are turned into NDJSON (one workout per line,
+sets nested) or CSV (one set per row) as they arrive, then sent in ~64 KB
+chunks, optionally through a streaming gzip compressor. Nothing holds more than
+one workout and one chunk at a time, so memory stays flat however long the
+history is, and the first bytes leave as soon as the first row is read.
+"""
+import csv
+import io
+import json
+import zlib
+from flask import Response, stream_with_context
+from sqlalchemy import select
+from models import db, Exercise, WorkoutTemplate, WorkoutLog, SetLog
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+CSV_COLUMNS = ['workout_id', 'date', 'template_id', 'template', 'duration_minutes', 'notes',
+               'set_id', 'exercise_id', 'exercise', 'set_number', 'weight', 'reps', 'rpe']
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+
+
+def export_rows(user_id):
+    """One row per set (or per workout without sets), newest workout first"""
+    stmt = select(
+        WorkoutLog.id.label('workout_id'),
+        WorkoutLog.date,
+        WorkoutLog.template_id,
+        WorkoutLog.duration_minutes,
+        WorkoutLog.notes,
+        SetLog.id.label('set_id'),
+        SetLog.exercise_id,
+        SetLog.set_number,
+        SetLog.weight,
+        SetLog.reps,
+        SetLog.rpe
+    ).outerjoin(SetLog, SetLog.workout_log_id == WorkoutLog.id)\
+     .where(WorkoutLog.user_id == user_id)\
+     .order_by(WorkoutLog.date.desc(), WorkoutLog.id, SetLog.id)\
+     .execution_options(yield_per=YIELD_PER)
+    return db.session.execute(stmt)
+
+
+def _names(model):
+    # The catalog is small; one lookup table beats joining it onto every set
+    return dict(db.session.execute(select(model.id, model.name)).all())
+
+
+def ndjson_lines(rows, exercises, templates):
+    workout = None
+    for row in rows:
+        if workout is None or workout['id'] != row.workout_id:
+            if workout is not None:
+                yield json.dumps(workout) + '\n'
+            workout = {
+                'id': row.workout_id,
+                'date': row.date.isoformat(),
+                'template_id': row.template_id,
+                'template': templates.get(row.template_id),
+                'duration_minutes': row.duration_minutes,
+                'notes': row.notes,
+                'sets': []
+            }
+        if row.set_id is not None:
+            workout['sets'].append({
+                'id': row.set_id,
+                'exercise_id': row.exercise_id,
+                'exercise': exercises.get(row.exercise_id),
+                'set_number': row.set_number,
+                'weight': row.weight,
+                'reps': row.reps,
+                'rpe': row.rpe
+            })
+    if workout is not None:
+        yield json.dumps(workout) + '\n'
+
+
+def csv_lines(rows, exercises, templates):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(CSV_COLUMNS)
+    for row in rows:
+        yield line([
+            row.workout_id, row.date.isoformat(), row.template_id, templates.get(row.template_id),
+            row.duration_minutes, row.notes, row.set_id, row.exercise_id, exercises.get(row.exercise_id),
+            row.set_number, row.weight, row.reps, row.rpe
+        ])
+
+
+def chunked(lines, size=CHUNK_SIZE):
+    """Join lines into chunks of about `size` characters; the first line goes out alone"""
+    buffer = []
+    length = 0
+    first = True
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if first or length >= size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            length = 0
+            first = False
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    first = True
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if first:
+            # Push the gzip header and first rows out now rather than at 32 KB
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(user_id, export_format, compress=False):
+    """Streaming download of the user's history in `export_format` (see FORMATS)"""
+    exercises = _names(Exercise)
+    templates = _names(WorkoutTemplate)
+    lines = ndjson_lines if export_format == 'ndjson' else csv_lines
+
+    def generate():
+        chunks = chunked(lines(export_rows(user_id), exercises, templates))
+        yield from gzipped(chunks) if compress else chunks
+
+    filename = f'workouts.{export_format}' + ('.gz' if compress else '')
+    response = Response(stream_with_context(generate()),
+                        mimetype='application/gzip' if compress else FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Stop proxies from buffering the whole stream before passing it on
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
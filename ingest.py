@@ -0,0 +1,221 @@
+"""
+Bulk workout ingestion for offline-synced and imported sessions.
+
+Workouts arrive as a JSON array (or {"workouts": [...]}) or as NDJSON, one
+workout per line, which is read from the request stream without buffering the
+whole upload. Items are validated up front, deduplicated by their optional
+client-supplied idempotency_key, and written with executemany inserts in
+batched transactions. Every item gets a result entry in input order.
+"""
+import json
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from models import db, Exercise, WorkoutTemplate, WorkoutLog, SetLog, WorkoutIdempotencyKey, UserStats
+from analytics import record_sets
+from records import update_personal_records
+from leaderboards import record_workouts as record_leaderboards
+from progression import invalidate_targets
+
+BATCH_SIZE = 500  # Workouts per transaction
+MAX_KEY_LENGTH = 100
+
+
+class InvalidWorkout(ValueError):
+    pass
+
+
+def iter_ndjson(stream):
+    """Yield one parsed workout per non-blank line; bad lines yield the error"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidWorkout(f'Invalid JSON: {e}')
+
+
+def _int(value, field, minimum=None, maximum=None):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise InvalidWorkout(f'{field} must be an integer')
+    if minimum is not None and value < minimum:
+        raise InvalidWorkout(f'{field} must be at least {minimum}')
+    if maximum is not None and value > maximum:
+        raise InvalidWorkout(f'{field} must be at most {maximum}')
+    return value
+
+
+def _number(value, field, minimum=None):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidWorkout(f'{field} must be a number')
+    if minimum is not None and value < minimum:
+        raise InvalidWorkout(f'{field} must be at least {minimum}')
+    return float(value)
+
+
+def validate_workout(item, exercise_ids, template_ids):
+    """Normalize one uploaded workout into insert-ready column values"""
+    if isinstance(item, InvalidWorkout):
+        raise item
+    if not isinstance(item, dict):
+        raise InvalidWorkout('Workout must be an object')
+
+    key = item.get('idempotency_key')
+    if key is not None:
+        if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+            raise InvalidWorkout(f'idempotency_key must be a string of 1-{MAX_KEY_LENGTH} characters')
+
+    template_id = item.get('template_id')
+    if template_id is not None and _int(template_id, 'template_id') not in template_ids:
+        raise InvalidWorkout(f'Unknown template_id {template_id}')
+
+    date = item.get('date')
+    if date is None:
+        date = datetime.utcnow()
+    else:
+        try:
+            date = datetime.fromisoformat(str(date).replace('Z', '+00:00'))
+        except ValueError:
+            raise InvalidWorkout('date must be an ISO 8601 timestamp')
+        if date.tzinfo is not None:
+            # Stored as naive UTC, like datetime.utcnow()
+            date = date.astimezone(timezone.utc).replace(tzinfo=None)
+
+    duration = item.get('duration_minutes')
+    if duration is not None:
+        _int(duration, 'duration_minutes', minimum=0)
+
+    notes = item.get('notes')
+    if notes is not None and not isinstance(notes, str):
+        raise InvalidWorkout('notes must be a string')
+
+    sets = item.get('sets')
+    if not isinstance(sets, list) or not sets:
+        raise InvalidWorkout('sets must be a non-empty list')
+    set_rows = []
+    for i, set_data in enumerate(sets):
+        if not isinstance(set_data, dict):
+            raise InvalidWorkout(f'sets[{i}] must be an object')
+        exercise_id = _int(set_data.get('exercise_id'), f'sets[{i}].exercise_id')
+        if exercise_id not in exercise_ids:
+            raise InvalidWorkout(f'sets[{i}]: unknown exercise_id {exercise_id}')
+        rpe = set_data.get('rpe')
+        if rpe is not None:
+            _int(rpe, f'sets[{i}].rpe', minimum=1, maximum=10)
+        set_rows.append({
+            'exercise_id': exercise_id,
+            'set_number': _int(set_data.get('set_number'), f'sets[{i}].set_number'),
+            'weight': _number(set_data.get('weight'), f'sets[{i}].weight', minimum=0),
+            'reps': _int(set_data.get('reps'), f'sets[{i}].reps', minimum=1),
+            'rpe': rpe
+        })
+
+    return {
+        'key': key,
+        'workout': {
+            'template_id': template_id,
+            'date': date,
+            'duration_minutes': duration,
+            'notes': notes or ''
+        },
+        'sets': set_rows
+    }
+
+
+def _write_batch(user_id, batch, repeats, results):
+    """Insert one batch of validated workouts in a single transaction"""
+    # Locked first, so the aggregates are read and written within this transaction
+    stats = UserStats.for_user(user_id, lock=True)
+    keys = [entry['key'] for _, entry in batch if entry['key'] is not None]
+    key_ids = {}
+    if keys:
+        key_ids = dict(db.session.query(WorkoutIdempotencyKey.key, WorkoutIdempotencyKey.workout_log_id)
+                                 .filter(WorkoutIdempotencyKey.user_id == user_id,
+                                         WorkoutIdempotencyKey.key.in_(keys)))
+
+    pending = []
+    for index, entry in batch:
+        if entry['key'] in key_ids:
+            results[index] = {'index': index, 'status': 'duplicate', 'workout_id': key_ids[entry['key']]}
+        else:
+            pending.append((index, entry))
+
+    if pending:
+        workout_ids = db.session.scalars(
+            insert(WorkoutLog).returning(WorkoutLog.id, sort_by_parameter_order=True),
+            [dict(entry['workout'], user_id=user_id) for _, entry in pending]
+        ).all()
+
+        set_rows = []
+        key_rows = []
+        for (index, entry), workout_id in zip(pending, workout_ids):
+            set_rows.extend(dict(row, workout_log_id=workout_id) for row in entry['sets'])
+            if entry['key'] is not None:
+                key_rows.append({'user_id': user_id, 'key': entry['key'], 'workout_log_id': workout_id})
+                key_ids[entry['key']] = workout_id
+            stats.record_workout(entry['workout']['date'])
+            results[index] = {'index': index, 'status': 'created', 'workout_id': workout_id}
+
+        set_ids = db.session.scalars(
+            insert(SetLog).returning(SetLog.id, sort_by_parameter_order=True), set_rows
+        ).all()
+        if key_rows:
+            db.session.execute(insert(WorkoutIdempotencyKey), key_rows)
+
+        # Derived aggregates, written in the same transaction as the sets
+        performed = [(entry['workout']['date'], row) for _, entry in pending for row in entry['sets']]
+        record_sets(user_id, [(date, row['exercise_id'], row['weight'], row['reps']) for date, row in performed])
+        update_personal_records(user_id, sorted(
+            ((set_id, row['exercise_id'], row['weight'], row['reps'], date)
+             for set_id, (date, row) in zip(set_ids, performed)),
+            key=lambda s: s[4]
+        ))
+        record_leaderboards(user_id, [
+            (entry['workout']['date'], [(row['exercise_id'], row['weight'], row['reps']) for row in entry['sets']])
+            for _, entry in pending
+        ])
+        invalidate_targets(user_id, {entry['workout']['template_id'] for _, entry in pending})
+
+    db.session.commit()
+
+    # Keys repeated within the batch point at whatever their first copy resolved to
+    for index, key in repeats:
+        results[index] = {'index': index, 'status': 'duplicate', 'workout_id': key_ids[key]}
+
+
+def ingest_workouts(user_id, items):
+    """Validate and store an iterable of workouts, returning per-item results"""
+    exercise_ids = {row[0] for row in db.session.query(Exercise.id)}
+    template_ids = {row[0] for row in db.session.query(WorkoutTemplate.id)}
+    results = {}
+    batch, batch_keys, repeats = [], set(), []
+    for index, item in enumerate(items):
+        try:
+            entry = validate_workout(item, exercise_ids, template_ids)
+        except InvalidWorkout as e:
+            results[index] = {'index': index, 'status': 'invalid', 'error': str(e)}
+            continue
+
+        key = entry['key']
+        if key is not None and key in batch_keys:
+            repeats.append((index, key))
+            continue
+        if key is not None:
+            batch_keys.add(key)
+        batch.append((index, entry))
+
+        if len(batch) >= BATCH_SIZE:
+            _write_batch(user_id, batch, repeats, results)
+            batch, batch_keys, repeats = [], set(), []
+
+    if batch:
+        _write_batch(user_id, batch, repeats, results)
+
+    ordered = [results[index] for index in sorted(results)]
+    summary = {status: 0 for status in ('created', 'duplicate', 'invalid')}
+    for result in ordered:
+        summary[result['status']] += 1
+    return summary, ordered
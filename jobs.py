@@ -0,0 +1,263 @@
+"""
+Durable background jobs for work that should not hold up a response.
+
+A job is a row in the job table, added with enqueue() to the same session as
+the write that needs it, so it exists exactly when that write commits. Once
+the commit lands, the worker threads of this process are woken; workers in
+other processes find it on their next poll. Handlers are registered by kind
+with @job('kind') and receive the job's JSON payload.
+
+Workers claim one job at a time with a single UPDATE ... RETURNING, so
+several processes can share the table. A job that raises is retried with
+exponential backoff (and jitter) until it has run JOB_MAX_ATTEMPTS times, then
+marked failed with its last error. A job whose worker died mid-run (a
+restart, a killed process) is requeued once its lease expires, so handlers
+must be safe to run twice.
+
+Start the workers once per serving process, after any fork (see serve.py and
+wsgi.py); without them, jobs simply wait in the table.
+
+Configuration (environment variables):
+    JOB_WORKERS          worker threads per process (default 2)
+    JOB_MAX_ATTEMPTS     runs before a job is marked failed (default 5)
+    JOB_RETRY_BASE       delay before the first retry in seconds, doubled per attempt (default 2)
+    JOB_RETRY_MAX        longest retry delay in seconds (default 600)
+    JOB_LEASE            seconds before a running job is presumed lost and reclaimed (default 300)
+    JOB_POLL_INTERVAL    seconds idle workers wait between checks for jobs from other processes (default 1)
+    JOB_RETENTION        seconds completed jobs are kept for the stats (default 86400)
+"""
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.orm import Session
+from metrics import Histogram
+from models import db, Job
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+RETRY_BASE = float(os.getenv('JOB_RETRY_BASE', 2))
+RETRY_MAX = float(os.getenv('JOB_RETRY_MAX', 600))
+LEASE = float(os.getenv('JOB_LEASE', 300))
+POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1))
+RETENTION = float(os.getenv('JOB_RETENTION', 24 * 3600))
+STATS_WINDOW = timedelta(hours=1)
+MAINTENANCE_INTERVAL = 60  # Seconds between idle workers' reclaim() and prune() passes
+
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0, 1800.0)
+JOB_WAIT = Histogram('job_wait_seconds', 'Time jobs spent queued past their scheduled start',
+                     labels=('kind',), buckets=JOB_BUCKETS)
+JOB_DURATION = Histogram('job_duration_seconds', 'Time spent running jobs',
+                         labels=('kind', 'status'), buckets=JOB_BUCKETS)
+
+HANDLERS = {}
+log = logging.getLogger(__name__)
+
+
+class UnknownJobKind(LookupError):
+    """No handler is registered for a job's kind (e.g. it was removed in a deploy)"""
+
+
+def job(kind):
+    """Register fn(payload) as the handler for jobs of `kind`"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, payload=None, delay=0, max_attempts=MAX_ATTEMPTS):
+    """Add a job to the current transaction; it runs once the transaction commits"""
+    if kind not in HANDLERS:
+        raise UnknownJobKind(f'No handler registered for job kind {kind!r}')
+    now = datetime.utcnow()
+    db.session.add(Job(kind=kind, payload=payload, status='queued', attempts=0, max_attempts=max_attempts,
+                       run_at=now + timedelta(seconds=delay), created_at=now))
+    db.session.info['jobs_enqueued'] = True
+
+
+def retry_delay(attempts):
+    """Seconds before retrying a job that has failed `attempts` times"""
+    delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _claim():
+    """Mark the next due job running and return it, or None"""
+    now = datetime.utcnow()
+    due = select(Job.id).where(Job.status == 'queued', Job.run_at <= now).order_by(Job.run_at, Job.id).limit(1)
+    # Idle polls stay read-only: on SQLite even an UPDATE that matches nothing takes the write lock
+    if db.session.scalar(due) is None:
+        db.session.rollback()
+        return None
+    claimed = db.session.execute(
+        update(Job).where(Job.id == due.with_for_update(skip_locked=True).scalar_subquery())
+        .values(status='running', started_at=now, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts, Job.run_at)
+    ).first()
+    db.session.commit()
+    return claimed
+
+
+def run_one():
+    """Claim and run a single job; False if none was due"""
+    claimed = _claim()
+    if claimed is None:
+        return False
+
+    started = time.perf_counter()
+    JOB_WAIT.observe(max((datetime.utcnow() - claimed.run_at).total_seconds(), 0), kind=claimed.kind)
+    try:
+        handler = HANDLERS.get(claimed.kind)
+        if handler is None:
+            raise UnknownJobKind(f'No handler registered for job kind {claimed.kind!r}')
+        handler(claimed.payload)
+        db.session.commit()
+        outcome = {'status': 'done', 'last_error': None}
+    except Exception as e:
+        db.session.rollback()
+        log.warning('Job %s (%s) failed on attempt %s: %s', claimed.id, claimed.kind, claimed.attempts, e)
+        outcome = {'status': 'queued', 'last_error': repr(e)[:2000]}
+        if claimed.attempts >= claimed.max_attempts or isinstance(e, UnknownJobKind):
+            outcome['status'] = 'failed'
+        else:
+            outcome['run_at'] = datetime.utcnow() + timedelta(seconds=retry_delay(claimed.attempts))
+
+    JOB_DURATION.observe(time.perf_counter() - started, kind=claimed.kind, status=outcome['status'])
+    if outcome['status'] != 'queued':
+        outcome['finished_at'] = datetime.utcnow()
+    db.session.execute(update(Job).where(Job.id == claimed.id).values(**outcome))
+    db.session.commit()
+    return True
+
+
+def reclaim(now=None):
+    """Requeue jobs whose lease expired (their worker died), or fail them if out of attempts"""
+    now = now or datetime.utcnow()
+    expired = (Job.status == 'running', Job.started_at < now - timedelta(seconds=LEASE))
+    db.session.execute(update(Job).where(*expired, Job.attempts >= Job.max_attempts)
+                       .values(status='failed', finished_at=now, last_error='Lease expired'))
+    db.session.execute(update(Job).where(*expired).values(status='queued', run_at=now))
+    db.session.commit()
+
+
+def prune(now=None):
+    """Delete completed jobs older than JOB_RETENTION; failed ones stay for inspection"""
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=RETENTION)
+    db.session.execute(delete(Job).where(Job.status == 'done', Job.finished_at < cutoff))
+    db.session.commit()
+
+
+class WorkerPool:
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self.app = None
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._last_maintenance = 0.0
+
+    def start(self, app):
+        """Start the worker threads (once per process, after forking)"""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            self.app = app
+            self._stop.clear()
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{n}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        self._wake.set()
+
+    @property
+    def running(self):
+        return len(self._threads)
+
+    def _run(self):
+        while not self._stop.is_set():
+            ran = False
+            try:
+                with self.app.app_context():
+                    ran = run_one()
+                    if not ran and time.monotonic() - self._last_maintenance > MAINTENANCE_INTERVAL:
+                        self._last_maintenance = time.monotonic()
+                        reclaim()
+                        prune()
+            except Exception:
+                log.exception('Job worker iteration failed')
+            if not ran:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+
+
+worker_pool = WorkerPool()
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'p50': round(values[len(values) // 2], 3),
+        'p95': round(values[min(int(len(values) * 0.95), len(values) - 1)], 3),
+        'max': round(values[-1], 3)
+    }
+
+
+def queue_stats():
+    """Queue depth by status and kind, plus wait and run times of the last hour's jobs"""
+    now = datetime.utcnow()
+    depth = {status: 0 for status in ('queued', 'running', 'done', 'failed')}
+    depth.update(db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+
+    queued = {
+        kind: {'count': count, 'oldest_seconds': round(max((now - oldest).total_seconds(), 0), 3)}
+        for kind, count, oldest in db.session.execute(
+            select(Job.kind, func.count(), func.min(Job.run_at))
+            .where(Job.status == 'queued', Job.run_at <= now)
+            .group_by(Job.kind)
+        )
+    }
+
+    since = now - STATS_WINDOW
+    finished = db.session.execute(
+        select(Job.status, Job.run_at, Job.started_at, Job.finished_at)
+        .where(Job.status.in_(('done', 'failed')), Job.finished_at >= since)
+    ).all()
+    completed = [row for row in finished if row.status == 'done']
+    return {
+        'depth': depth,
+        'due_by_kind': queued,
+        'last_hour': {
+            'completed': len(completed),
+            'failed': len(finished) - len(completed),
+            'wait_seconds': _percentiles([(row.started_at - row.run_at).total_seconds() for row in completed]),
+            'run_seconds': _percentiles([(row.finished_at - row.started_at).total_seconds() for row in completed])
+        },
+        'workers': worker_pool.running
+    }
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_on_commit(session):
+    if session.info.pop('jobs_enqueued', False):
+        worker_pool.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('jobs_enqueued', None)
@@ -0,0 +1,174 @@
+"""
+Weekly and monthly leaderboards across users.
+
+Every board (period, period start, metric and, for best lifts, exercise) is a
+set of LeaderboardEntry rows, one per user who trained in that period:
+
+    workouts    workouts logged
+    volume      sum of weight * reps over all sets
+    best_lift   heaviest weight lifted for one exercise
+
+record_workouts() folds new workouts into the boards with one upsert in the
+same transaction as the workout, and existing history is loaded once by a
+GROUP BY over workout_log and set_log (see migrations.py), so views never
+aggregate set_log.
+
+The top N of a board is the head of the (board, value) index. A user's rank
+is the number of higher scores plus one: it is answered by bisecting a sorted
+snapshot of the board's values, read once per LEADERBOARD_SNAPSHOT_TTL seconds
+per process, against the user's current score. Ranks may therefore lag other
+users' new workouts by that long; the user's own score is always current.
+"""
+import os
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from sqlalchemy import Date, case, func, insert, literal, select
+from database import dialect_insert
+from models import db, LeaderboardEntry, SetLog, User, WorkoutLog
+from analytics import week_start
+from ttl_cache import TTLCache
+
+PERIODS = ('week', 'month')
+METRICS = ('workouts', 'volume', 'best_lift')
+EXERCISE_METRICS = ('best_lift',)
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+SNAPSHOT_TTL = float(os.getenv('LEADERBOARD_SNAPSHOT_TTL', 60))
+SNAPSHOT_CACHE_SIZE = int(os.getenv('LEADERBOARD_SNAPSHOT_CACHE_SIZE', 256))
+
+_snapshots = TTLCache(max_entries=SNAPSHOT_CACHE_SIZE, ttl=SNAPSHOT_TTL)
+
+
+def month_start(when):
+    day = when.date() if isinstance(when, datetime) else when
+    return day.replace(day=1)
+
+
+def period_start(period, when):
+    """First day of the week (Monday) or month containing `when`"""
+    return week_start(when) if period == 'week' else month_start(when)
+
+
+def record_workouts(user_id, workouts):
+    """Fold new workouts into the boards; workouts are (date, [(exercise_id, weight, reps), ...])"""
+    scores = {}
+
+    def add(key, value):
+        scores[key] = scores.get(key, 0) + value
+
+    for when, sets in workouts:
+        for period in PERIODS:
+            start = period_start(period, when)
+            add((period, start, 'workouts', 0), 1)
+            volume = sum((weight or 0) * reps for _, weight, reps in sets)
+            if volume > 0:
+                add((period, start, 'volume', 0), volume)
+            for exercise_id, weight, _ in sets:
+                if weight is not None and weight > 0:
+                    key = (period, start, 'best_lift', exercise_id)
+                    scores[key] = max(scores.get(key, 0), weight)
+    if not scores:
+        return
+
+    table = LeaderboardEntry.__table__
+    stmt = dialect_insert(LeaderboardEntry)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.period, table.c.period_start, table.c.metric, table.c.exercise_id, table.c.user_id],
+        set_={'value': case(
+            (table.c.metric == 'best_lift',
+             case((stmt.excluded.value > table.c.value, stmt.excluded.value), else_=table.c.value)),
+            else_=table.c.value + stmt.excluded.value
+        )}
+    )
+    db.session.execute(stmt, [
+        {'period': period, 'period_start': start, 'metric': metric, 'exercise_id': exercise_id,
+         'user_id': user_id, 'value': value}
+        for (period, start, metric, exercise_id), value in scores.items()
+    ])
+
+
+def _board(period, start, metric, exercise_id):
+    return (LeaderboardEntry.period == period, LeaderboardEntry.period_start == start,
+            LeaderboardEntry.metric == metric, LeaderboardEntry.exercise_id == exercise_id)
+
+
+def _snapshot(board_key):
+    """The board's values in ascending order, cached per process"""
+    values = _snapshots.get(board_key)
+    if values is None:
+        # Core rows, not ORM ones: a large board loads about twice as fast
+        values = array('d', db.session.connection().execute(
+            select(LeaderboardEntry.value).where(*_board(*board_key)).order_by(LeaderboardEntry.value)
+        ).scalars())
+        _snapshots.set(board_key, values)
+    return values
+
+
+def leaderboard(user_id, metric, period='week', when=None, exercise_id=None, limit=DEFAULT_LIMIT):
+    """Top `limit` users of a board and the caller's own rank (None if they have no score)"""
+    start = period_start(period, when or datetime.utcnow())
+    board_key = (period, start, metric, exercise_id or 0)
+    board = _board(*board_key)
+
+    top = db.session.execute(
+        select(LeaderboardEntry.user_id, User.name, LeaderboardEntry.value)
+        .join(User, User.id == LeaderboardEntry.user_id)
+        .where(*board)
+        .order_by(LeaderboardEntry.value.desc(), LeaderboardEntry.user_id)
+        .limit(limit)
+    ).all()
+    entries = []
+    for position, (entry_user_id, name, value) in enumerate(top, start=1):
+        # Tied scores share the rank of the first of them
+        rank = entries[-1]['rank'] if entries and entries[-1]['value'] == value else position
+        entries.append({'rank': rank, 'user_id': entry_user_id, 'name': name, 'value': value})
+
+    me = None
+    mine = db.session.get(LeaderboardEntry, (period, start, metric, exercise_id or 0, int(user_id)))
+    if mine is not None:
+        values = _snapshot(board_key)
+        rank = len(values) - bisect_right(values, mine.value) + 1
+        me = {'rank': rank, 'value': mine.value, 'participants': max(len(values), rank)}
+
+    for row in entries + ([me] if me else []):
+        row['value'] = round(row['value'], 2)
+    return {
+        'metric': metric,
+        'period': period,
+        'period_start': start,
+        'exercise_id': exercise_id,
+        'entries': entries,
+        'me': me
+    }
+
+
+def _period_expr(period, dialect_name):
+    if dialect_name == 'postgresql':
+        return func.date_trunc(period, WorkoutLog.date).cast(Date)
+    if period == 'week':
+        return func.date(WorkoutLog.date, 'weekday 0', '-6 days')
+    return func.date(WorkoutLog.date, 'start of month')
+
+
+def backfill_statements(dialect_name):
+    """INSERT ... SELECTs building every board from workout history, one per period and metric"""
+    columns = ['period', 'period_start', 'metric', 'exercise_id', 'user_id', 'value']
+    statements = []
+    for period in PERIODS:
+        start = _period_expr(period, dialect_name)
+        volume = func.sum(func.coalesce(SetLog.weight, 0) * SetLog.reps)
+        selects = [
+            select(literal(period), start, literal('workouts'), literal(0), WorkoutLog.user_id, func.count())
+            .group_by(WorkoutLog.user_id, start),
+            select(literal(period), start, literal('volume'), literal(0), WorkoutLog.user_id, volume)
+            .join(SetLog, SetLog.workout_log_id == WorkoutLog.id)
+            .group_by(WorkoutLog.user_id, start).having(volume > 0),
+            select(literal(period), start, literal('best_lift'), SetLog.exercise_id, WorkoutLog.user_id,
+                   func.max(SetLog.weight))
+            .join(SetLog, SetLog.workout_log_id == WorkoutLog.id)
+            .where(SetLog.weight > 0)
+            .group_by(WorkoutLog.user_id, SetLog.exercise_id, start)
+        ]
+        statements.extend(insert(LeaderboardEntry).from_select(columns, s) for s in selects)
+    return statements
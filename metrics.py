@@ -0,0 +1,231 @@
+"""
+Request-level performance metrics in Prometheus text format.
+
+init_metrics() hooks the Flask app and the SQLAlchemy engine to record:
+
+- http_request_duration_seconds: latency per route, method and status
+- http_request_db_statements / http_request_db_seconds: SQL issued per request
+- db_statement_duration_seconds: every statement, by operation
+- external_call_duration_seconds: bcrypt and Gemini calls, via external_call()
+
+render() produces the text served at /metrics. Counts are per process, so
+under gunicorn each worker reports its own; scrape every worker or aggregate
+in Prometheus with sum() by route.
+
+A request sent with `X-Server-Timing: 1` (or every request, when
+SERVER_TIMING=1) gets a Server-Timing header breaking its time down into
+app, db and external calls, readable in the browser's network panel.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SQL_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE'}
+SERVER_TIMING_HEADER = 'X-Server-Timing'
+ALWAYS_SERVER_TIMING = os.getenv('SERVER_TIMING') == '1'
+
+_registry = []
+_current = ContextVar('request_metrics', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        # Bucket counts are stored per bucket and accumulated when rendering
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, float('inf')), series):
+                cumulative += bucket
+                labels = _format_labels(self.labels, key, [('le', _format_number(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_format_number(series[-2])}')
+            lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time spent handling requests',
+                             labels=('method', 'route', 'status'))
+REQUEST_DB_STATEMENTS = Histogram('http_request_db_statements', 'SQL statements issued per request',
+                                  labels=('route',), buckets=COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram('http_request_db_seconds', 'Time spent in SQL per request',
+                               labels=('route',))
+STATEMENT_DURATION = Histogram('db_statement_duration_seconds', 'SQL statement execution time',
+                               labels=('operation',), buckets=STATEMENT_BUCKETS)
+EXTERNAL_DURATION = Histogram('external_call_duration_seconds', 'Time spent in slow library or remote calls',
+                              labels=('service', 'operation'))
+EXTERNAL_ERRORS = Counter('external_call_errors_total', 'Slow library or remote calls that raised',
+                          labels=('service', 'operation'))
+
+
+class RequestMetrics:
+    """What one request spent its time on"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_statements = 0
+        self.db_seconds = 0.0
+        self.external = {}  # service -> seconds
+
+    def server_timing(self, total):
+        parts = [f'app;dur={total * 1000:.1f}',
+                 f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_statements} statements"']
+        parts += [f'{service};dur={seconds * 1000:.1f}' for service, seconds in self.external.items()]
+        return ', '.join(parts)
+
+
+@contextmanager
+def external_call(service, operation):
+    """Time a slow call (bcrypt, Gemini) and charge it to the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_ERRORS.inc(service=service, operation=operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        EXTERNAL_DURATION.observe(elapsed, service=service, operation=operation)
+        current = _current.get()
+        if current is not None:
+            current.external[service] = current.external.get(service, 0.0) + elapsed
+
+
+def render():
+    """Every metric in Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _route_label():
+    # The URL rule, not the path, so ids do not explode label cardinality
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def _before_request():
+    g.request_metrics = RequestMetrics()
+    g.request_metrics_token = _current.set(g.request_metrics)
+
+
+def _after_request(response):
+    current = g.pop('request_metrics', None)
+    if current is None:
+        return response
+    elapsed = time.perf_counter() - current.started
+    route = _route_label()
+    REQUEST_DURATION.observe(elapsed, method=request.method, route=route, status=str(response.status_code))
+    REQUEST_DB_STATEMENTS.observe(current.db_statements, route=route)
+    REQUEST_DB_SECONDS.observe(current.db_seconds, route=route)
+    if ALWAYS_SERVER_TIMING or request.headers.get(SERVER_TIMING_HEADER) == '1':
+        response.headers['Server-Timing'] = current.server_timing(elapsed)
+    return response
+
+
+def _teardown_request(exc):
+    token = g.pop('request_metrics_token', None)
+    if token is not None:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+    operation = statement.lstrip()[:6].upper()
+    STATEMENT_DURATION.observe(elapsed, operation=operation if operation in SQL_OPERATIONS else 'OTHER')
+    current = _current.get()
+    if current is not None:
+        current.db_statements += 1
+        current.db_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    if exception_context.connection is not None:
+        starts = exception_context.connection.info.get('metrics_query_start')
+        if starts:
+            starts.pop()
+
+
+def init_metrics(app, db):
+    """Instrument the app's requests and its database engine"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
@@ -0,0 +1,126 @@
+"""
+Versioned schema migrations.
+
+db.create_all() only creates missing tables; it never touches tables that
+already exist, so indexes, backfills and data fixes for existing databases are
+registered here instead. Each migration runs once, in version order, inside its
+own transaction, and is recorded in the schema_migration table.
+"""
+from datetime import datetime
+from sqlalchemy import select
+from models import db, SchemaMigration, Exercise, ExerciseEquipment, ExerciseMuscleGroup, exercise_tag_rows, \
+    WorkoutTemplate, TemplateExercise, TemplateTargets, WorkoutLog
+from analytics import backfill_statement as weekly_stats_backfill
+from records import backfill_statement as personal_records_backfill
+from leaderboards import backfill_statements as leaderboard_backfill
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register fn(connection) as schema migration number `version`"""
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def create_model_indexes(connection, unique=False):
+    """Create any index declared on the models that the database lacks
+
+    Unique indexes are skipped unless asked for: existing rows may violate
+    them, so the migration introducing one cleans the data up first.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if unique or not index.unique:
+                index.create(connection, checkfirst=True)
+
+
+def run_migrations():
+    """Apply pending migrations; call inside an app context after create_all()"""
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+    db.session.rollback()
+
+    for version, name, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        with db.engine.begin() as connection:
+            fn(connection)
+            connection.execute(SchemaMigration.__table__.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        print(f"Applied migration {version}: {name}")
+
+
+@migration(1, 'Indexes for history, set, template and category lookups')
+def add_hot_path_indexes(connection):
+    create_model_indexes(connection)
+
+
+@migration(2, 'Backfill weekly exercise analytics from set history')
+def backfill_exercise_weekly_stats(connection):
+    connection.execute(weekly_stats_backfill(connection.dialect.name))
+
+
+@migration(3, 'Backfill personal records from set history')
+def backfill_personal_records(connection):
+    connection.execute(personal_records_backfill())
+
+
+@migration(4, 'Exercise muscle group and equipment association tables')
+def backfill_exercise_tags(connection):
+    table = Exercise.__table__
+    muscles, equipment = [], []
+    for exercise_id, muscle_groups, equipment_needed in connection.execute(
+            select(table.c.id, table.c.muscle_groups, table.c.equipment_needed)):
+        exercise_muscles, exercise_equipment = exercise_tag_rows(exercise_id, muscle_groups, equipment_needed)
+        muscles.extend(exercise_muscles)
+        equipment.extend(exercise_equipment)
+    connection.execute(ExerciseMuscleGroup.__table__.delete())
+    connection.execute(ExerciseEquipment.__table__.delete())
+    if muscles:
+        connection.execute(ExerciseMuscleGroup.__table__.insert(), muscles)
+    if equipment:
+        connection.execute(ExerciseEquipment.__table__.insert(), equipment)
+
+
+@migration(5, 'Merge duplicated seed templates and make catalog names unique')
+def dedupe_catalog_names(connection):
+    # Older startups re-inserted the seed templates on every boot. Keep the
+    # first copy of each name and point logged workouts at it.
+    template = WorkoutTemplate.__table__
+    keep = {}
+    duplicates = {}
+    for template_id, name in connection.execute(select(template.c.id, template.c.name).order_by(template.c.id)):
+        if name in keep:
+            duplicates.setdefault(keep[name], []).append(template_id)
+        else:
+            keep[name] = template_id
+
+    for keep_id, duplicate_ids in duplicates.items():
+        connection.execute(WorkoutLog.__table__.update()
+                           .where(WorkoutLog.template_id.in_(duplicate_ids))
+                           .values(template_id=keep_id))
+        connection.execute(TemplateExercise.__table__.delete().where(TemplateExercise.template_id.in_(duplicate_ids)))
+        connection.execute(template.delete().where(template.c.id.in_(duplicate_ids)))
+
+    create_model_indexes(connection, unique=True)
+
+
+@migration(6, 'Index workout history by template for progression targets')
+def add_template_history_index(connection):
+    create_model_indexes(connection)
+
+
+@migration(7, 'Backfill weekly and monthly leaderboards from workout history')
+def backfill_leaderboards(connection):
+    for statement in leaderboard_backfill(connection.dialect.name):
+        connection.execute(statement)
+
+
+@migration(8, 'Drop stored progression targets that suggested a load of 0 for bodyweight sets')
+def drop_stale_targets(connection):
+    # Targets are recomputed on the next read (progression.py)
+    connection.execute(TemplateTargets.__table__.delete())
@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-import bcrypt
+from sqlalchemy import event, inspect, update
+from datetime import datetime, timedelta
+import json
+from passwords import password_hasher
  
 db = SQLAlchemy()
  
@@ -12,40 +14,53 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Onboarding fields
-    goals = db.Column(db.Text)  # JSON string of goals
+    goals = db.Column(db.JSON(none_as_null=True))  # list of goals
     schedule = db.Column(db.String(50))  # e.g., "3-4 days/week"
-    equipment = db.Column(db.Text)  # JSON string of available equipment
+    equipment = db.Column(db.JSON(none_as_null=True))  # list of available equipment
     experience_level = db.Column(db.String(20))  # beginner, intermediate, advanced
     onboarding_completed = db.Column(db.Boolean, default=False)
     
     # Relationships
     workout_logs = db.relationship('WorkoutLog', backref='user', lazy=True)
     
+    # Both may raise passwords.HashingBusy when the hashing pool is saturated
     def set_password(self, password):
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return password_hasher.check(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
             'id': self.id,
             'email': self.email,
             'name': self.name,
-            'goals': self.goals,
+            'goals': self.goals or [],
             'schedule': self.schedule,
-            'equipment': self.equipment,
+            'equipment': self.equipment or [],
             'experience_level': self.experience_level,
             'onboarding_completed': self.onboarding_completed,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
+        }
+    
+    def profile(self):
+        """The onboarding answers that shape AI tips"""
+        return {
+            'goals': self.goals or [],
+            'schedule': self.schedule,
+            'equipment': self.equipment or [],
+            'experience_level': self.experience_level
         }
 
 class Exercise(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    category = db.Column(db.String(50), nullable=False)  # push, pull, legs, upper, lower
-    muscle_groups = db.Column(db.Text)  # JSON string of muscle groups
-    equipment_needed = db.Column(db.Text)  # JSON string of equipment
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)
+    category = db.Column(db.String(50), nullable=False, index=True)  # push, pull, legs, upper, lower
+    muscle_groups = db.Column(db.JSON(none_as_null=True))  # list of muscle groups
+    equipment_needed = db.Column(db.JSON(none_as_null=True))  # list of equipment
     instructions = db.Column(db.Text)
     
     def to_dict(self):
@@ -53,14 +68,48 @@ class Exercise(db.Model):
             'id': self.id,
             'name': self.name,
             'category': self.category,
-            'muscle_groups': self.muscle_groups,
-            'equipment_needed': self.equipment_needed,
+            'muscle_groups': self.muscle_groups or [],
+            'equipment_needed': self.equipment_needed or [],
             'instructions': self.instructions
         }
 
+# Indexed copies of Exercise.muscle_groups / equipment_needed so catalog
+# filters run in SQL; kept in sync by the mapper events below
+class ExerciseMuscleGroup(db.Model):
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), primary_key=True)
+    muscle = db.Column(db.String(50), primary_key=True, index=True)
+
+class ExerciseEquipment(db.Model):
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), primary_key=True)
+    equipment = db.Column(db.String(50), primary_key=True, index=True)  # 'none' when nothing is needed
+
+def exercise_tag_rows(exercise_id, muscle_groups, equipment_needed):
+    """Association rows for one exercise's muscle groups and equipment"""
+    muscles = [{'exercise_id': exercise_id, 'muscle': m} for m in dict.fromkeys(muscle_groups or [])]
+    equipment = [{'exercise_id': exercise_id, 'equipment': e} for e in dict.fromkeys(equipment_needed or ['none'])]
+    return muscles, equipment
+
+def _write_exercise_tags(connection, exercise):
+    muscles, equipment = exercise_tag_rows(exercise.id, exercise.muscle_groups, exercise.equipment_needed)
+    for model, rows in ((ExerciseMuscleGroup, muscles), (ExerciseEquipment, equipment)):
+        table = model.__table__
+        connection.execute(table.delete().where(table.c.exercise_id == exercise.id))
+        if rows:
+            connection.execute(table.insert(), rows)
+
+@event.listens_for(Exercise, 'after_insert')
+def _insert_exercise_tags(mapper, connection, exercise):
+    _write_exercise_tags(connection, exercise)
+
+@event.listens_for(Exercise, 'after_update')
+def _update_exercise_tags(mapper, connection, exercise):
+    attrs = inspect(exercise).attrs
+    if attrs.muscle_groups.history.has_changes() or attrs.equipment_needed.history.has_changes():
+        _write_exercise_tags(connection, exercise)
+
 class WorkoutTemplate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)
     type = db.Column(db.String(50), nullable=False)  # upper_lower, push_pull_legs
     description = db.Column(db.Text)
     
@@ -75,15 +124,29 @@ class WorkoutTemplate(db.Model):
             'description': self.description,
             'exercises': [te.to_dict() for te in self.template_exercises]
         }
+    
+    def to_compact(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'type': self.type,
+            'description': self.description,
+            'exercises': [te.to_compact() for te in self.template_exercises]
+        }
 
 class TemplateExercise(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'), nullable=False)
+    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'), nullable=False, index=True)
     exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
     sets = db.Column(db.Integer, nullable=False)
     reps_range = db.Column(db.String(20))  # e.g., "8-12", "5"
     order = db.Column(db.Integer, nullable=False)
     
+    # One exercise per slot, so the seed manifest can upsert by position
+    __table_args__ = (
+        db.Index('ix_template_exercise_template_id_order', template_id, order, unique=True),
+    )
+    
     # Relationships
     exercise = db.relationship('Exercise', backref='template_uses')
     
@@ -95,15 +158,30 @@ class TemplateExercise(db.Model):
             'reps_range': self.reps_range,
             'order': self.order
         }
+    
+    def to_compact(self):
+        return {
+            'id': self.id,
+            'exercise_id': self.exercise_id,
+            'sets': self.sets,
+            'reps_range': self.reps_range,
+            'order': self.order
+        }
 
 class WorkoutLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
-    date = db.Column(db.DateTime, default=datetime.utcnow)
+    date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     duration_minutes = db.Column(db.Integer)
     notes = db.Column(db.Text)
     
+    # History is always filtered by user (and, for progression, template) and read newest first
+    __table_args__ = (
+        db.Index('ix_workout_log_user_id_date', user_id, date.desc()),
+        db.Index('ix_workout_log_user_id_template_id_date', user_id, template_id, date.desc()),
+    )
+    
     # Relationships
     set_logs = db.relationship('SetLog', backref='workout', lazy=True)
     template = db.relationship('WorkoutTemplate', backref='workout_logs')
@@ -112,16 +190,29 @@ class WorkoutLog(db.Model):
         return {
             'id': self.id,
             'template': self.template.to_dict() if self.template else None,
-            'date': self.date.isoformat(),
+            'date': self.date,
             'duration_minutes': self.duration_minutes,
             'notes': self.notes,
             'sets': [s.to_dict() for s in self.set_logs]
         }
+    
+    def to_compact(self):
+        return {
+            'id': self.id,
+            'template_id': self.template_id,
+            'date': self.date,
+            'duration_minutes': self.duration_minutes,
+            'notes': self.notes,
+            'sets': [s.to_row() for s in self.set_logs]
+        }
 
 class SetLog(db.Model):
+    # Column order of SetLog.to_row(), sent alongside compact payloads
+    ROW_FIELDS = ['id', 'exercise_id', 'set_number', 'weight', 'reps', 'rpe']
+    
     id = db.Column(db.Integer, primary_key=True)
-    workout_log_id = db.Column(db.Integer, db.ForeignKey('workout_log.id'), nullable=False)
-    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
+    workout_log_id = db.Column(db.Integer, db.ForeignKey('workout_log.id'), nullable=False, index=True)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False, index=True)
     set_number = db.Column(db.Integer, nullable=False)
     weight = db.Column(db.Float)
     reps = db.Column(db.Integer, nullable=False)
@@ -139,3 +230,212 @@ class SetLog(db.Model):
             'reps': self.reps,
             'rpe': self.rpe
         }
+    
+    def to_row(self):
+        return [self.id, self.exercise_id, self.set_number, self.weight, self.reps, self.rpe]
+
+class SchemaMigration(db.Model):
+    """Schema changes applied to this database, see migrations.py"""
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AppSetting(db.Model):
+    """Small key/value facts about this database, e.g. the seeded catalog version"""
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class WorkoutIdempotencyKey(db.Model):
+    """Client-supplied key for an ingested workout, so retried uploads are not duplicated"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)
+    workout_log_id = db.Column(db.Integer, db.ForeignKey('workout_log.id'), nullable=False)
+
+class UserStats(db.Model):
+    """Per-user dashboard aggregates, kept current by every workout write"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_workouts = db.Column(db.Integer, nullable=False, default=0)
+    first_day = db.Column(db.Date)  # Day represented by bit 0 of activity_bitmap
+    last_day = db.Column(db.Date)  # Most recent day with a workout
+    activity_bitmap = db.Column(db.LargeBinary, nullable=False, default=b'')  # One bit per day since first_day
+    current_streak = db.Column(db.Integer, nullable=False, default=0)  # Consecutive days ending at last_day
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    weekly_counts = db.Column(db.Text)  # JSON string of {"YYYY-Www": workouts}
+
+    @classmethod
+    def for_user(cls, user_id, lock=False):
+        """Load the user's stats row, building it from their history the first time
+
+        Pass lock=True before record_workout(), ahead of flushing the new
+        workouts: the row is then read under a lock held until the commit, so
+        concurrent workouts for the same user cannot overwrite each other's
+        aggregates. A freshly built row is already inserted; commit to keep it.
+        """
+        user_id = int(user_id)
+        if lock:
+            # Write before reading: on SQLite this takes the database write lock
+            # (FOR UPDATE is a no-op there); on PostgreSQL it locks the row
+            db.session.execute(update(cls).where(cls.user_id == user_id)
+                               .values(total_workouts=cls.total_workouts)
+                               .execution_options(synchronize_session=False))
+        stats = db.session.get(cls, user_id, populate_existing=lock, with_for_update=lock)
+        if stats is not None:
+            return stats
+
+        from database import dialect_insert  # database.py imports this module
+        built = cls(user_id=user_id, total_workouts=0, activity_bitmap=b'',
+                    current_streak=0, longest_streak=0, weekly_counts='{}')
+        for (workout_date,) in db.session.query(WorkoutLog.date).filter_by(user_id=user_id):
+            built.record_workout(workout_date)
+        # A concurrent first request may have inserted the row meanwhile; then theirs is read back
+        db.session.execute(dialect_insert(cls).values(
+            {column.key: getattr(built, column.key) for column in cls.__table__.columns}
+        ).on_conflict_do_nothing(index_elements=['user_id']))
+        return db.session.get(cls, user_id, populate_existing=True, with_for_update=lock)
+
+    @staticmethod
+    def week_key(day):
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+
+    def record_workout(self, when):
+        """Fold one workout into the aggregates"""
+        day = (when or datetime.utcnow()).date()
+        bits = int.from_bytes(self.activity_bitmap or b'', 'little')
+
+        if self.first_day is None:
+            self.first_day = day
+        elif day < self.first_day:
+            # Backdated workout: shift the bitmap so bit 0 stays the earliest day
+            bits <<= (self.first_day - day).days
+            self.first_day = day
+        bits |= 1 << (day - self.first_day).days
+        self.activity_bitmap = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+        if self.last_day is None or day > self.last_day:
+            self.last_day = day
+        self.total_workouts = (self.total_workouts or 0) + 1
+
+        weekly = json.loads(self.weekly_counts) if self.weekly_counts else {}
+        key = self.week_key(day)
+        weekly[key] = weekly.get(key, 0) + 1
+        self.weekly_counts = json.dumps(weekly, sort_keys=True)
+
+        # Streak ending at the latest active day
+        offset = (self.last_day - self.first_day).days
+        streak = 0
+        while offset - streak >= 0 and (bits >> (offset - streak)) & 1:
+            streak += 1
+        self.current_streak = streak
+
+        # Longest run of set bits; a backdated day can join two earlier runs
+        longest, run_bits = 0, bits
+        while run_bits:
+            run_bits &= run_bits >> 1
+            longest += 1
+        self.longest_streak = longest
+
+    def to_dict(self, today=None, weeks=12):
+        today = today or datetime.utcnow().date()
+        weekly = json.loads(self.weekly_counts) if self.weekly_counts else {}
+        # A streak is still alive until a full day passes without a workout
+        alive = self.last_day is not None and (today - self.last_day).days <= 1
+        this_monday = today - timedelta(days=today.weekday())
+        recent_weeks = []
+        for i in range(weeks - 1, -1, -1):
+            key = self.week_key(this_monday - timedelta(weeks=i))
+            recent_weeks.append({'week': key, 'workouts': weekly.get(key, 0)})
+        return {
+            'total_workouts': self.total_workouts,
+            'week_workouts': weekly.get(self.week_key(today), 0),
+            'current_streak': self.current_streak if alive else 0,
+            'longest_streak': self.longest_streak,
+            'last_workout_date': self.last_day,
+            'weekly_counts': recent_weeks
+        }
+
+class ExerciseWeeklyStats(db.Model):
+    """Per-user, per-exercise training totals for one week (Monday start), see analytics.py"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True)
+    sets = db.Column(db.Integer, nullable=False, default=0)
+    reps = db.Column(db.Integer, nullable=False, default=0)
+    tonnage = db.Column(db.Float, nullable=False, default=0)  # Sum of weight * reps
+    best_e1rm = db.Column(db.Float)  # Best estimated one-rep max (Epley)
+    best_weight = db.Column(db.Float)
+    
+    __table_args__ = (
+        db.Index('ix_exercise_weekly_stats_user_id_week_start', user_id, week_start),
+    )
+    
+    def to_dict(self):
+        return {
+            'week': self.week_start,
+            'sets': self.sets,
+            'reps': self.reps,
+            'tonnage': round(self.tonnage, 2),
+            'best_e1rm': round(self.best_e1rm, 2) if self.best_e1rm is not None else None,
+            'best_weight': self.best_weight
+        }
+
+class PersonalRecord(db.Model):
+    """Heaviest weight a user has lifted for a given exercise and rep count, see records.py"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), primary_key=True)
+    reps = db.Column(db.Integer, primary_key=True)
+    weight = db.Column(db.Float, nullable=False)
+    set_log_id = db.Column(db.Integer, db.ForeignKey('set_log.id'))
+    achieved_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'exercise_id': self.exercise_id,
+            'reps': self.reps,
+            'weight': self.weight,
+            'set_log_id': self.set_log_id,
+            'achieved_at': self.achieved_at
+        }
+
+class TemplateTargets(db.Model):
+    """Precomputed next-session targets for one user and template, see progression.py"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'), primary_key=True)
+    targets = db.Column(db.JSON, nullable=False)
+    based_on_workout_id = db.Column(db.Integer)  # Newest workout id when computed
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+class Job(db.Model):
+    """A unit of background work, see jobs.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False)  # Not before; pushed back on retry
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    
+    # Workers claim by (status, run_at); the admin stats read recent finishes
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', status, run_at),
+        db.Index('ix_job_status_finished_at', status, finished_at),
+    )
+
+class LeaderboardEntry(db.Model):
+    """One user's score on one weekly or monthly leaderboard, see leaderboards.py"""
+    period = db.Column(db.String(5), primary_key=True)  # week, month
+    period_start = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)  # workouts, volume, best_lift
+    exercise_id = db.Column(db.Integer, primary_key=True, default=0)  # 0 unless the metric is per exercise
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    value = db.Column(db.Float, nullable=False)
+    
+    # A board's top N is the head of this index; "my rank" reads its values once per snapshot
+    __table_args__ = (
+        db.Index('ix_leaderboard_entry_board_value', period, period_start, metric, exercise_id, value.desc(), user_id),
+    )
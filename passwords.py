@@ -0,0 +1,156 @@
+"""
+Password hashing off the request threads.
+
+bcrypt is deliberately CPU-bound, so hashing inline lets a burst of logins
+occupy every request thread (and, through the GIL, starve the rest of the
+process). Hashes and checks run in a small dedicated process pool instead,
+with a cap on how many may be queued or running at once. When the cap is
+reached the caller gets HashingBusy, which the auth routes turn into
+429 Too Many Requests with a Retry-After estimate.
+
+The bcrypt cost is configurable. Hashes made with a different cost still
+verify, and login rehashes them at the current cost (see needs_rehash()).
+
+Hashing processes are started with forkserver (or spawn), never by forking
+the threaded server, so scripts that hash passwords must keep their entry
+point under `if __name__ == '__main__':`.
+
+Every serving process (each gunicorn worker) has its own pool, so the server
+as a whole runs PASSWORD_HASH_WORKERS x WEB_CONCURRENCY hashing processes. The
+default therefore splits a budget of half the usable CPUs across the
+WEB_CONCURRENCY serving processes (at least one each), leaving the other half
+for requests during a login burst. The queue cap is per process too.
+
+Configuration (environment variables):
+    BCRYPT_ROUNDS            bcrypt cost factor (default 12)
+    PASSWORD_HASH_WORKERS    hashing processes per serving process (default: half the CPUs divided by
+                             WEB_CONCURRENCY, at least 1); 0 hashes inline
+    PASSWORD_HASH_QUEUE      hashes allowed in flight per serving process before rejecting
+                             (default 4 per hashing process)
+"""
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from metrics import Counter, external_call
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+
+
+def _usable_cpus():
+    # The affinity mask honours cpusets (e.g. containers); cpu_count() is the whole host
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def default_hash_workers():
+    """Hashing processes per serving process, so that all of them together use about half the CPUs"""
+    cpus = _usable_cpus()
+    serving_processes = max(int(os.getenv('WEB_CONCURRENCY', cpus)), 1)
+    return max(1, cpus // 2 // serving_processes)
+
+
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', default_hash_workers()))
+MAX_PENDING = int(os.getenv('PASSWORD_HASH_QUEUE', max(HASH_WORKERS, 1) * 4))
+
+REJECTED = Counter('password_hash_rejected_total', 'Password hashes refused because the pool was saturated',
+                   labels=('operation',))
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already queued; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__('Too many sign-in attempts in progress, please retry shortly')
+        self.retry_after = retry_after
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def _timed(fn, *args):
+    """Run fn in the hashing process and report how long the hash itself took"""
+    start = time.perf_counter()
+    return fn(*args), time.perf_counter() - start
+
+
+def hash_rounds(password_hash):
+    """Cost factor a bcrypt hash was made with ("$2b$12$..." -> 12)"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=HASH_WORKERS, max_pending=MAX_PENDING):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max(max_pending, 1)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._average_seconds = 0.25  # Running estimate of one hash, for Retry-After
+
+    @property
+    def pool(self):
+        # Created on first use, so each gunicorn worker starts its own after fork
+        with self._lock:
+            if self._pool is None:
+                # Never fork a threaded server process; forkserver children start clean
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained"""
+        waves = self._pending / max(self.workers, 1)
+        return max(1, math.ceil(waves * self._average_seconds))
+
+    def hash(self, password):
+        return self._run('hash', _hash, password, self.rounds)
+
+    def check(self, password, password_hash):
+        return self._run('check', _check, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+    def _run(self, operation, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                REJECTED.inc(operation=operation)
+                raise HashingBusy(self.retry_after())
+            self._pending += 1
+        try:
+            with external_call('bcrypt', operation):
+                if self.workers <= 0:
+                    result, seconds = _timed(fn, *args)
+                else:
+                    try:
+                        result, seconds = self.pool.submit(_timed, fn, *args).result()
+                    except BrokenProcessPool:
+                        # A hashing process died; start a fresh pool next time
+                        with self._lock:
+                            self._pool = None
+                        raise
+                # Hashing time only: retry_after() already accounts for the queue ahead
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * seconds
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,225 @@
+"""
+Next-session targets for a workout template (progressive overload).
+
+For every slot of a template, the user's last sessions of that template are
+compared with the slot's rep range ("6-8") to pick a weight x reps target:
+
+    all working sets at the top of the range   add load and drop to the bottom
+                                               (two steps if it felt easy, RPE <= 7;
+                                               none if it was a max effort, RPE 10)
+    inside the range                           same load, one more rep
+                                               (same reps after a max effort)
+    below the range                            same load, aim for the bottom again;
+                                               after two misses in a row, or a miss at
+                                               RPE 10, deload by DELOAD_FACTOR
+    bodyweight (no load logged)                reps only, weight stays None: one more rep
+                                               inside the range, the bottom below it, and
+                                               at the top "max_reps" (add load or move to
+                                               a harder variation; no weight is suggested)
+
+Working sets are the sets at the session's heaviest weight for the exercise.
+Results are stored in TemplateTargets per (user, template) when first read.
+Logging a workout for the template deletes the row and, in the same
+transaction, queues a job that recomputes it (jobs.py), so reading the plan
+at the start of the next session is a primary-key lookup. Only deleted rows
+are recomputed: users who never open the plan cost no extra writes. A
+computation that raced with a newer workout is never stored (see _store()).
+"""
+import re
+from datetime import datetime
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.orm import joinedload
+from database import dialect_insert
+from jobs import enqueue, job
+from models import db, TemplateExercise, TemplateTargets, WorkoutLog, SetLog
+
+HISTORY_SESSIONS = 3  # Most recent sessions of the template examined
+DELOAD_FACTOR = 0.9
+DEFAULT_INCREMENT = 2.5
+INCREMENTS = {'dumbbells': 2.0, 'kettlebell': 4.0}  # Smallest practical jump, by equipment
+
+_RANGE = re.compile(r'^\s*(\d+)\s*(?:[-–]\s*(\d+))?\s*$')
+
+
+def parse_reps_range(text):
+    """'6-8' -> (6, 8), '5' -> (5, 5); None when there is no numeric range"""
+    match = _RANGE.match(text or '')
+    if not match:
+        return None
+    low = int(match.group(1))
+    high = int(match.group(2) or low)
+    return min(low, high), max(low, high)
+
+
+def load_increment(exercise):
+    for equipment in exercise.equipment_needed or []:
+        if equipment in INCREMENTS:
+            return INCREMENTS[equipment]
+    return DEFAULT_INCREMENT
+
+
+def _round_to(weight, increment):
+    return round(round(weight / increment) * increment, 2)
+
+
+def _working_sets(sets):
+    """(weight, [reps], hardest rpe or None) of the sets at the heaviest weight"""
+    top = max(weight or 0 for weight, _, _ in sets)
+    working = [(reps, rpe) for weight, reps, rpe in sets if (weight or 0) == top]
+    rpes = [rpe for _, rpe in working if rpe is not None]
+    return top, [reps for reps, _ in working], max(rpes) if rpes else None
+
+
+def recommend(rep_range, sessions, increment=DEFAULT_INCREMENT):
+    """Target for one exercise from its sessions, newest first, each a list of (weight, reps, rpe)
+
+    Returns {'weight', 'reps', 'rule'}; weight is None without history and for bodyweight sets.
+    """
+    if not sessions:
+        return {'weight': None, 'reps': rep_range[0] if rep_range else None, 'rule': 'no_history'}
+
+    weight, reps, rpe = _working_sets(sessions[0])
+    low, high = rep_range or (min(reps), min(reps))
+    achieved = min(reps)
+    if weight == 0:
+        # Unloaded sets (dips, pull-ups): progress on reps, never on a load of 0
+        weight = None
+
+    if achieved >= high:
+        if weight is None:
+            return {'weight': None, 'reps': high, 'rule': 'max_reps'}
+        if rpe is not None and rpe >= 10:
+            return {'weight': weight, 'reps': high, 'rule': 'consolidate'}
+        steps = 2 if rpe is not None and rpe <= 7 else 1
+        return {'weight': _round_to(weight + steps * increment, increment), 'reps': low, 'rule': 'increase_weight'}
+
+    if achieved < low:
+        missed_before = False
+        if weight is not None and len(sessions) > 1:
+            previous_weight, previous_reps, _ = _working_sets(sessions[1])
+            missed_before = previous_weight >= weight and min(previous_reps) < low
+        if weight is not None and (missed_before or (rpe is not None and rpe >= 10)):
+            return {'weight': _round_to(weight * DELOAD_FACTOR, increment), 'reps': low, 'rule': 'deload'}
+        return {'weight': weight, 'reps': low, 'rule': 'repeat'}
+
+    if rpe is not None and rpe >= 10:
+        return {'weight': weight, 'reps': achieved, 'rule': 'hold'}
+    return {'weight': weight, 'reps': min(achieved + 1, high), 'rule': 'add_reps'}
+
+
+def compute_targets(user_id, template_id):
+    """(targets for every slot, newest workout id when they were computed)
+
+    targets is None when the template has no slots (or does not exist).
+    """
+    slots = TemplateExercise.query.options(joinedload(TemplateExercise.exercise))\
+                                  .filter_by(template_id=template_id)\
+                                  .order_by(TemplateExercise.order).all()
+    if not slots:
+        return None, None
+
+    # Any workout logged from here on gets a higher id; O(1), unlike the max for this template
+    based_on = db.session.scalar(select(func.max(WorkoutLog.id)))
+    workouts = db.session.execute(
+        select(WorkoutLog.id, WorkoutLog.date)
+        .where(WorkoutLog.user_id == user_id, WorkoutLog.template_id == template_id)
+        .order_by(WorkoutLog.date.desc())
+        .limit(HISTORY_SESSIONS)
+    ).all()
+
+    # exercise_id -> [(date, [(weight, reps, rpe), ...]) per session, newest first]
+    sessions = {}
+    if workouts:
+        dates = dict(workouts)
+        rows = db.session.execute(
+            select(SetLog.workout_log_id, SetLog.exercise_id, SetLog.weight, SetLog.reps, SetLog.rpe)
+            .where(SetLog.workout_log_id.in_(dates), SetLog.exercise_id.in_({s.exercise_id for s in slots}))
+            .order_by(SetLog.workout_log_id, SetLog.id)
+        ).all()
+        by_session = {}
+        for workout_id, exercise_id, weight, reps, rpe in rows:
+            by_session.setdefault((exercise_id, workout_id), []).append((weight, reps, rpe))
+        for (exercise_id, workout_id), sets in by_session.items():
+            sessions.setdefault(exercise_id, []).append((dates[workout_id], sets))
+        for performed in sessions.values():
+            performed.sort(key=lambda session: session[0], reverse=True)
+
+    targets = []
+    for slot in slots:
+        performed = sessions.get(slot.exercise_id, [])
+        rep_range = parse_reps_range(slot.reps_range)
+        target = recommend(rep_range, [sets for _, sets in performed], load_increment(slot.exercise))
+        last = None
+        if performed:
+            date, sets = performed[0]
+            last = {'date': date.isoformat(), 'sets': [{'weight': w, 'reps': r, 'rpe': rpe} for w, r, rpe in sets]}
+        targets.append({
+            'exercise_id': slot.exercise_id,
+            'exercise': slot.exercise.name,
+            'order': slot.order,
+            'sets': slot.sets,
+            'reps_range': slot.reps_range,
+            'target_weight': target['weight'],
+            'target_reps': target['reps'],
+            'rule': target['rule'],
+            'last_session': last
+        })
+    return targets, based_on
+
+
+def _store(user_id, template_id, targets, based_on, computed_at):
+    """Upsert the targets unless a newer workout for the template was logged meanwhile"""
+    # "+ 0" keeps the planner off the (user, template) index, which it would walk
+    # end to end; the primary key range past based_on is almost always empty
+    newer = select(WorkoutLog.id).where(WorkoutLog.id > (based_on or 0),
+                                        WorkoutLog.user_id + 0 == user_id,
+                                        WorkoutLog.template_id + 0 == template_id).exists()
+    row = select(literal(user_id), literal(template_id), literal(targets, TemplateTargets.targets.type),
+                 literal(based_on, db.Integer), literal(computed_at, db.DateTime)).where(~newer)
+    stmt = dialect_insert(TemplateTargets).from_select(
+        ['user_id', 'template_id', 'targets', 'based_on_workout_id', 'computed_at'], row
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'template_id'],
+        set_={column: stmt.excluded[column] for column in ('targets', 'based_on_workout_id', 'computed_at')}
+    )
+    db.session.execute(stmt)
+
+
+def next_session_targets(user_id, template_id):
+    """{'template_id', 'computed_at', 'exercises'} for the next session, or None for an unknown template"""
+    user_id, template_id = int(user_id), int(template_id)
+    cached = db.session.get(TemplateTargets, (user_id, template_id))
+    if cached is not None:
+        return {'template_id': template_id, 'computed_at': cached.computed_at, 'exercises': cached.targets}
+
+    targets, based_on = compute_targets(user_id, template_id)
+    if targets is None:
+        return None
+    computed_at = datetime.utcnow()
+    _store(user_id, template_id, targets, based_on, computed_at)
+    db.session.commit()
+    return {'template_id': template_id, 'computed_at': computed_at, 'exercises': targets}
+
+
+def invalidate_targets(user_id, template_ids):
+    """Drop stored targets for templates that just got a workout and queue their recomputation
+
+    Call before the commit, so both happen with the workout or not at all.
+    """
+    template_ids = {t for t in template_ids if t is not None}
+    if not template_ids:
+        return
+    stale = db.session.scalars(
+        delete(TemplateTargets)
+        .where(TemplateTargets.user_id == user_id, TemplateTargets.template_id.in_(template_ids))
+        .returning(TemplateTargets.template_id)
+    ).all()
+    if stale:
+        enqueue('precompute_targets', {'user_id': int(user_id), 'template_ids': sorted(stale)})
+
+
+@job('precompute_targets')
+def precompute_targets(payload):
+    for template_id in payload['template_ids']:
+        next_session_targets(payload['user_id'], template_id)
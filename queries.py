@@ -0,0 +1,112 @@
+"""
+Query planning for endpoints that serialize whole workout trees.
+
+WorkoutLog.to_dict() walks template -> template_exercises -> exercise and
+set_logs -> exercise. Left to lazy loading that is one SELECT per hop per row,
+so these helpers attach loader options that fetch each level for the whole
+page at once: a history page costs a fixed number of statements no matter how
+many workouts or sets it holds.
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_, exists, select
+from sqlalchemy.orm import joinedload, selectinload
+from models import Exercise, ExerciseEquipment, ExerciseMuscleGroup, WorkoutLog, WorkoutTemplate, TemplateExercise, SetLog
+
+# Everything WorkoutLog.to_dict() touches
+WORKOUT_TREE = (
+    joinedload(WorkoutLog.template)
+        .selectinload(WorkoutTemplate.template_exercises)
+        .joinedload(TemplateExercise.exercise),
+    selectinload(WorkoutLog.set_logs)
+        .joinedload(SetLog.exercise),
+)
+
+# Everything WorkoutTemplate.to_dict() touches
+TEMPLATE_TREE = (
+    selectinload(WorkoutTemplate.template_exercises)
+        .joinedload(TemplateExercise.exercise),
+)
+
+
+def workout_history_query(user_id):
+    """A user's workouts, newest first, with the full tree eagerly loaded"""
+    # Ties on date break by ascending id, which is the order rows already have
+    # inside the (user_id, date DESC) index, so no sort step is needed
+    return WorkoutLog.query.options(*WORKOUT_TREE)\
+                           .filter_by(user_id=user_id)\
+                           .order_by(WorkoutLog.date.desc(), WorkoutLog.id)
+
+
+def encode_cursor(workout):
+    """Opaque cursor pointing just past `workout` in history order"""
+    raw = f"{workout.date.isoformat()},{workout.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(); raises ValueError for malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date, workout_id = raw.rsplit(',', 1)
+        return datetime.fromisoformat(date), int(workout_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def workout_history_after(user_id, cursor, limit):
+    """One keyset page of history, returned with the cursor for the next page
+
+    Seeks straight to the cursor position through the (user_id, date) index
+    instead of counting and skipping rows with OFFSET.
+    """
+    query = workout_history_query(user_id)
+    if cursor:
+        date, workout_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            WorkoutLog.date < date,
+            and_(WorkoutLog.date == date, WorkoutLog.id > workout_id)
+        ))
+
+    # One extra row tells us whether another page exists
+    workouts = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(workouts[limit - 1]) if len(workouts) > limit else None
+    return workouts[:limit], next_cursor
+
+
+def workout_detail_query(user_id, workout_id):
+    """A single workout owned by the user, with the full tree eagerly loaded"""
+    return WorkoutLog.query.options(*WORKOUT_TREE)\
+                           .filter_by(id=workout_id, user_id=user_id)
+
+
+def template_query():
+    """All workout templates with their exercises eagerly loaded"""
+    return WorkoutTemplate.query.options(*TEMPLATE_TREE)
+
+
+def exercise_query(category=None, equipment=None, muscles=None):
+    """Catalog exercises, optionally limited to a category, the equipment a
+    user has (None means any) and muscle groups (matching any of them)
+
+    Both filters read the indexed association tables, so no exercise row is
+    loaded and parsed just to be thrown away.
+    """
+    query = Exercise.query
+    if category:
+        query = query.filter(Exercise.category == category)
+    if muscles:
+        query = query.filter(Exercise.id.in_(
+            select(ExerciseMuscleGroup.exercise_id).where(ExerciseMuscleGroup.muscle.in_(muscles))
+        ))
+    if equipment is not None:
+        # Bodyweight moves are always available
+        available = set(equipment) | {'none'}
+        query = query.filter(
+            Exercise.id.in_(
+                select(ExerciseEquipment.exercise_id).where(ExerciseEquipment.equipment.in_(available))
+            ),
+            ~exists().where(ExerciseEquipment.exercise_id == Exercise.id,
+                            ExerciseEquipment.equipment.not_in(available))
+        )
+    return query.order_by(Exercise.id)
@@ -0,0 +1,91 @@
+"""
+Personal records (rep maxes) maintained on write.
+
+PersonalRecord keeps the heaviest weight per (user, exercise, rep count), so
+"is this set a PR?" is a dictionary lookup against rows fetched once per
+workout instead of a scan over every set the user has logged. Records are
+written with a conditional upsert that only ever raises the stored weight,
+keeping them correct when two workouts for the same user commit concurrently.
+"""
+from sqlalchemy import func, insert, select
+from database import dialect_insert
+from models import db, PersonalRecord, SetLog, WorkoutLog
+
+
+def update_personal_records(user_id, sets):
+    """Apply new sets and return {set_log_id: previous best weight or None} for the PR sets
+
+    `sets` holds (set_log_id, exercise_id, weight, reps, achieved_at) tuples in
+    the order they were performed.
+    """
+    sets = [s for s in sets if s[2] is not None and s[2] > 0]
+    if not sets:
+        return {}
+
+    exercise_ids = {exercise_id for _, exercise_id, _, _, _ in sets}
+    current = {
+        (exercise_id, reps): weight
+        for exercise_id, reps, weight in db.session.query(PersonalRecord.exercise_id,
+                                                          PersonalRecord.reps,
+                                                          PersonalRecord.weight)
+                                                   .filter(PersonalRecord.user_id == user_id,
+                                                           PersonalRecord.exercise_id.in_(exercise_ids))
+    }
+
+    best = {}
+    new_records = {}
+    for set_log_id, exercise_id, weight, reps, achieved_at in sets:
+        key = (exercise_id, reps)
+        previous = best[key]['weight'] if key in best else current.get(key)
+        if previous is None or weight > previous:
+            best[key] = {'weight': weight, 'set_log_id': set_log_id, 'achieved_at': achieved_at}
+            new_records[set_log_id] = previous
+
+    if best:
+        table = PersonalRecord.__table__
+        stmt = dialect_insert(PersonalRecord)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.exercise_id, table.c.reps],
+            set_={
+                'weight': stmt.excluded.weight,
+                'set_log_id': stmt.excluded.set_log_id,
+                'achieved_at': stmt.excluded.achieved_at
+            },
+            where=stmt.excluded.weight > table.c.weight
+        )
+        db.session.execute(stmt, [
+            dict(record, user_id=user_id, exercise_id=exercise_id, reps=reps)
+            for (exercise_id, reps), record in best.items()
+        ])
+
+    return new_records
+
+
+def rep_maxes(user_id, exercise_id):
+    """The user's records for one exercise, lowest rep count first"""
+    return PersonalRecord.query.filter_by(user_id=user_id, exercise_id=exercise_id)\
+                               .order_by(PersonalRecord.reps).all()
+
+
+def backfill_statement():
+    """INSERT ... SELECT of every user's best set per exercise and rep count (earliest wins ties)"""
+    ranked = select(
+        WorkoutLog.user_id,
+        SetLog.exercise_id,
+        SetLog.reps,
+        SetLog.weight,
+        SetLog.id.label('set_log_id'),
+        WorkoutLog.date,
+        func.row_number().over(
+            partition_by=(WorkoutLog.user_id, SetLog.exercise_id, SetLog.reps),
+            order_by=(SetLog.weight.desc(), WorkoutLog.date, SetLog.id)
+        ).label('rank')
+    ).join(WorkoutLog, SetLog.workout_log_id == WorkoutLog.id)\
+     .where(SetLog.weight > 0)\
+     .subquery()
+
+    return insert(PersonalRecord).from_select(
+        ['user_id', 'exercise_id', 'reps', 'weight', 'set_log_id', 'achieved_at'],
+        select(ranked.c.user_id, ranked.c.exercise_id, ranked.c.reps, ranked.c.weight,
+               ranked.c.set_log_id, ranked.c.date).where(ranked.c.rank == 1)
+    )
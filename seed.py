@@ -0,0 +1,149 @@
+"""
+Versioned seed manifest for the exercise and template catalog.
+
+seed_catalog() compares SEED_VERSION with the version recorded in app_setting
+and returns immediately when they match, so a normal restart costs a single
+primary-key lookup. Otherwise the manifest is written with a few bulk upserts
+keyed on exercise and template names, all in one transaction, and the new
+version is recorded with it. Re-running is harmless: rows are updated in place
+rather than duplicated.
+
+Bump SEED_VERSION whenever EXERCISES or TEMPLATES change.
+"""
+from datetime import datetime
+from database import dialect_insert
+from models import db, AppSetting, Exercise, ExerciseEquipment, ExerciseMuscleGroup, \
+    WorkoutTemplate, TemplateExercise, TemplateTargets, exercise_tag_rows
+from catalog_cache import bump_catalog_version
+
+SEED_VERSION = 1
+SEED_VERSION_KEY = 'seed_version'
+
+EXERCISES = [
+    # Push exercises
+    {'name': 'Bench Press', 'category': 'push', 'muscle_groups': ['chest', 'triceps', 'shoulders'], 'equipment_needed': ['barbell', 'bench']},
+    {'name': 'Overhead Press', 'category': 'push', 'muscle_groups': ['shoulders', 'triceps'], 'equipment_needed': ['barbell']},
+    {'name': 'Incline Dumbbell Press', 'category': 'push', 'muscle_groups': ['chest', 'shoulders'], 'equipment_needed': ['dumbbells', 'bench']},
+    {'name': 'Dips', 'category': 'push', 'muscle_groups': ['chest', 'triceps'], 'equipment_needed': ['dip_bars']},
+
+    # Pull exercises
+    {'name': 'Pull-ups', 'category': 'pull', 'muscle_groups': ['lats', 'biceps'], 'equipment_needed': ['pull_up_bar']},
+    {'name': 'Barbell Rows', 'category': 'pull', 'muscle_groups': ['lats', 'rhomboids', 'biceps'], 'equipment_needed': ['barbell']},
+    {'name': 'Lat Pulldowns', 'category': 'pull', 'muscle_groups': ['lats', 'biceps'], 'equipment_needed': ['cable_machine']},
+    {'name': 'Face Pulls', 'category': 'pull', 'muscle_groups': ['rear_delts', 'rhomboids'], 'equipment_needed': ['cable_machine']},
+
+    # Legs exercises
+    {'name': 'Squats', 'category': 'legs', 'muscle_groups': ['quads', 'glutes'], 'equipment_needed': ['barbell']},
+    {'name': 'Deadlifts', 'category': 'legs', 'muscle_groups': ['hamstrings', 'glutes', 'lower_back'], 'equipment_needed': ['barbell']},
+    {'name': 'Romanian Deadlifts', 'category': 'legs', 'muscle_groups': ['hamstrings', 'glutes'], 'equipment_needed': ['barbell']},
+    {'name': 'Leg Press', 'category': 'legs', 'muscle_groups': ['quads', 'glutes'], 'equipment_needed': ['leg_press_machine']},
+
+    # Upper body compound
+    {'name': 'Barbell Curls', 'category': 'upper', 'muscle_groups': ['biceps'], 'equipment_needed': ['barbell']},
+    {'name': 'Close-Grip Bench Press', 'category': 'upper', 'muscle_groups': ['triceps', 'chest'], 'equipment_needed': ['barbell', 'bench']},
+
+    # Lower body
+    {'name': 'Calf Raises', 'category': 'lower', 'muscle_groups': ['calves'], 'equipment_needed': ['none']},
+    {'name': 'Lunges', 'category': 'lower', 'muscle_groups': ['quads', 'glutes'], 'equipment_needed': ['dumbbells']}
+]
+
+TEMPLATES = [
+    {
+        'name': 'Push/Pull/Legs',
+        'type': 'push_pull_legs',
+        'description': 'A 3-day split focusing on pushing movements, pulling movements, and leg exercises',
+        'exercises': [
+            {'exercise_name': 'Bench Press', 'sets': 4, 'reps_range': '6-8', 'order': 1},
+            {'exercise_name': 'Overhead Press', 'sets': 3, 'reps_range': '8-10', 'order': 2},
+            {'exercise_name': 'Incline Dumbbell Press', 'sets': 3, 'reps_range': '10-12', 'order': 3},
+            {'exercise_name': 'Dips', 'sets': 3, 'reps_range': '12-15', 'order': 4}
+        ]
+    },
+    {
+        'name': 'Upper/Lower',
+        'type': 'upper_lower',
+        'description': 'A 2-day split alternating between upper body and lower body exercises',
+        'exercises': [
+            {'exercise_name': 'Bench Press', 'sets': 4, 'reps_range': '6-8', 'order': 1},
+            {'exercise_name': 'Barbell Rows', 'sets': 4, 'reps_range': '6-8', 'order': 2},
+            {'exercise_name': 'Overhead Press', 'sets': 3, 'reps_range': '8-10', 'order': 3},
+            {'exercise_name': 'Pull-ups', 'sets': 3, 'reps_range': '8-12', 'order': 4}
+        ]
+    }
+]
+
+
+def seeded_version():
+    setting = db.session.get(AppSetting, SEED_VERSION_KEY)
+    return int(setting.value) if setting and setting.value else None
+
+
+def _upsert(model, rows, index_elements, update_columns, returning=()):
+    stmt = dialect_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: stmt.excluded[column] for column in update_columns}
+    )
+    if returning:
+        return db.session.execute(stmt.returning(*returning), rows).all()
+    db.session.execute(stmt, rows)
+
+
+def _replace_exercise_tags(exercise_rows):
+    # Upserts bypass the ORM events that normally keep these tables in sync
+    muscles, equipment = [], []
+    for exercise_id, data in exercise_rows:
+        exercise_muscles, exercise_equipment = exercise_tag_rows(
+            exercise_id, data['muscle_groups'], data['equipment_needed']
+        )
+        muscles.extend(exercise_muscles)
+        equipment.extend(exercise_equipment)
+
+    ids = [exercise_id for exercise_id, _ in exercise_rows]
+    for model, rows in ((ExerciseMuscleGroup, muscles), (ExerciseEquipment, equipment)):
+        db.session.execute(model.__table__.delete().where(model.exercise_id.in_(ids)))
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+
+
+def seed_catalog(force=False):
+    """Write the manifest unless this database already has it; True if it wrote"""
+    if not force and seeded_version() == SEED_VERSION:
+        db.session.rollback()
+        return False
+
+    try:
+        # One statement per row would serialize the catalog; each upsert below
+        # carries the whole list, and RETURNING hands back ids in the same trip
+        exercise_ids = {name: exercise_id for exercise_id, name in _upsert(
+            Exercise, EXERCISES, ['name'], ['category', 'muscle_groups', 'equipment_needed'],
+            returning=(Exercise.id, Exercise.name)
+        )}
+        _replace_exercise_tags([(exercise_ids[data['name']], data) for data in EXERCISES])
+
+        template_rows = [{k: v for k, v in template.items() if k != 'exercises'} for template in TEMPLATES]
+        template_ids = {name: template_id for template_id, name in _upsert(
+            WorkoutTemplate, template_rows, ['name'], ['type', 'description'],
+            returning=(WorkoutTemplate.id, WorkoutTemplate.name)
+        )}
+
+        slots = [{
+            'template_id': template_ids[template['name']],
+            'exercise_id': exercise_ids[slot['exercise_name']],
+            'sets': slot['sets'],
+            'reps_range': slot['reps_range'],
+            'order': slot['order']
+        } for template in TEMPLATES for slot in template['exercises']]
+        _upsert(TemplateExercise, slots, ['template_id', 'order'], ['exercise_id', 'sets', 'reps_range'])
+        # Stored progression targets follow the old slots and rep ranges
+        TemplateTargets.query.delete(synchronize_session=False)
+
+        _upsert(AppSetting, [{'key': SEED_VERSION_KEY, 'value': str(SEED_VERSION), 'updated_at': datetime.utcnow()}],
+                ['key'], ['value', 'updated_at'])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    bump_catalog_version()
+    return True
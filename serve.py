@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Production server for the Fitness Tracker API.
+
+Runs the app under gunicorn with a pool of worker processes, each serving
+requests on several threads and running background jobs (jobs.py) on
+JOB_WORKERS more. Tables are created and the catalog seeded once in the
+master process before workers fork, so workers boot straight into serving.
+
+Configuration (environment variables):
+    PORT               listen port (default 5000)
+    WEB_CONCURRENCY    worker processes (default: CPU count)
+    WEB_THREADS        threads per worker (default 4)
+    KEEPALIVE          seconds to hold idle keep-alive connections (default 5)
+    TIMEOUT            seconds before a stuck worker is killed and replaced (default 30)
+    GRACEFUL_TIMEOUT   seconds workers get to finish in-flight requests on restart (default 30)
+    MAX_REQUESTS       recycle a worker after this many requests, 0 disables (default 0)
+
+Graceful restarts: send SIGHUP to the master to replace workers one by one
+while in-flight requests complete. The app is preloaded in the master, so
+picking up new code needs a full restart (or SIGUSR2 for a binary upgrade).
+"""
+import multiprocessing
+import os
+from gunicorn.app.base import BaseApplication
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def build_options():
+    """Gunicorn settings derived from the environment"""
+    workers = _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count())
+    threads = _env_int('WEB_THREADS', 4)
+    return {
+        'bind': f"0.0.0.0:{_env_int('PORT', 5000)}",
+        'workers': max(workers, 1),
+        'threads': max(threads, 1),
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'keepalive': _env_int('KEEPALIVE', 5),
+        'timeout': _env_int('TIMEOUT', 30),
+        'graceful_timeout': _env_int('GRACEFUL_TIMEOUT', 30),
+        'max_requests': _env_int('MAX_REQUESTS', 0),
+        'max_requests_jitter': _env_int('MAX_REQUESTS', 0) // 10,
+        'preload_app': True,
+        # Heartbeat files on tmpfs so a slow container disk cannot stall workers
+        'worker_tmp_dir': '/dev/shm' if os.path.isdir('/dev/shm') else None,
+        'accesslog': '-',
+        'errorlog': '-',
+        'post_fork': post_fork,
+    }
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections instead of the master's, and its job workers"""
+    from jobs import worker_pool
+    from models import db
+    app = server.app.wsgi()  # The app preloaded in the master
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # Threads do not survive fork, so they start here rather than in the master
+    worker_pool.start(app)
+
+
+class FitnessTrackerServer(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None and key in self.cfg.settings:
+                self.cfg.set(key, value)
+
+    def load(self):
+        # Runs once in the master because preload_app is set
+        from app import create_app, init_db
+        app = create_app()
+        init_db(app)
+        return app
+
+
+def main():
+    FitnessTrackerServer(build_options()).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -23,12 +23,17 @@ def check_dependencies():
         print("Please run: pip install -r requirements.txt")
         return False
  
-def start_backend():
-    """Start the Flask backend server"""
+def start_backend(production=False):
+    """Start the Flask backend server (gunicorn worker pool with --prod)"""
     try:
-        print("Starting Flask backend server...")
+        if production:
+            print("Starting production backend server...")
+            entry_point = "serve.py"
+        else:
+            print("Starting Flask backend server...")
+            entry_point = "app.py"
         backend_process = subprocess.Popen([
-            sys.executable, "app.py"
+            sys.executable, entry_point
         ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         return backend_process
     except Exception as e:
@@ -61,7 +66,7 @@ def main():
         sys.exit(1)
     
     # Start backend
-    backend = start_backend()
+    backend = start_backend(production="--prod" in sys.argv[1:])
     if not backend:
         print("❌ Failed to start backend server")
         sys.exit(1)
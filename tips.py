@@ -0,0 +1,214 @@
+"""
+AI training tips service.
+
+Wraps the Gemini model behind a few guarantees so the profile-tips route
+never ties up a request worker on the remote call:
+
+- the model client (and its library) is loaded on first use, once per process
+- every call has a hard deadline, after which the local rule-based tips answer
+- results are cached (LRU with TTL) by a hash of the normalized profile
+- concurrent requests for the same profile share a single in-flight call
+- the warm_tips job (jobs.py) generates them ahead of time, e.g. right after
+  onboarding, retrying with backoff if the model fails
+
+Set AI_TIPS_MODEL=stub (or pass a model_factory) to use StubModel, which
+answers offline, so tests and benchmarks never reach Gemini.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from jobs import job
+from metrics import external_call
+from ttl_cache import TTLCache
+
+MODEL_NAME = 'gemini-1.5-flash'
+TIPS_TIMEOUT = float(os.getenv('AI_TIPS_TIMEOUT', 4))  # Seconds a request waits for the model
+WARM_TIMEOUT = float(os.getenv('AI_TIPS_WARM_TIMEOUT', 30))  # Seconds a warm_tips job waits for it
+CACHE_TTL = float(os.getenv('AI_TIPS_CACHE_TTL', 6 * 3600))
+CACHE_SIZE = int(os.getenv('AI_TIPS_CACHE_SIZE', 1024))
+MAX_CONCURRENT_CALLS = int(os.getenv('AI_TIPS_MAX_CONCURRENT', 4))
+
+
+def profile_to_prompt(profile: dict) -> str:
+    goals = ", ".join(profile.get('goals', [])) or "unspecified goals"
+    equipment = ", ".join(profile.get('equipment', [])) or "no equipment"
+    schedule = profile.get('schedule') or "unspecified schedule"
+    experience = profile.get('experience_level') or "unspecified experience"
+    return (
+        f"User profile:\n"
+        f"- Goals: {goals}\n"
+        f"- Schedule: {schedule}\n"
+        f"- Equipment: {equipment}\n"
+        f"- Experience: {experience}\n\n"
+        f"Provide 5 concise, actionable training tips tailored to the user."
+        f" Focus on exercise selection, progression, recovery, and adherence."
+        f" Use bullet points, 1 sentence each."
+    )
+
+
+def local_tips(profile: dict):
+    tips = []
+    goals = set(profile.get('goals', []))
+    equipment = set(profile.get('equipment', []))
+    schedule = (profile.get('schedule') or '').lower()
+    experience = (profile.get('experience_level') or '').lower()
+
+    if 'muscle_gain' in goals or 'strength' in goals:
+        tips.append("Prioritize compound lifts and add small weekly load or rep increases.")
+    if 'weight_loss' in goals:
+        tips.append("Keep rests short and add brisk walks on non-training days to raise weekly activity.")
+    if 'endurance' in goals:
+        tips.append("Include 1–2 zone-2 cardio sessions weekly alongside resistance training.")
+    if 'cable_machine' in equipment:
+        tips.append("Use cable moves to keep tension constant for accessories like rows and face pulls.")
+    if 'bodyweight_only' in equipment and not equipment - {'bodyweight_only'}:
+        tips.append("Use slow eccentrics and pause reps to make bodyweight sessions more effective.")
+    if '3-4' in schedule or '3-4 days' in schedule:
+        tips.append("Run a simple upper/lower split across two alternating days each week.")
+    if experience in ('beginner', '0-1 years'):
+        tips.append("Repeat the same key lifts to build skill; keep RPE ~7–8 and track every session.")
+    if not tips:
+        tips = [
+            "Aim for 8–12 hard sets per muscle per week and log all sessions.",
+            "Warm up with lighter sets, then keep working sets within 2–3 reps of failure.",
+            "Progress either weight or reps each week on your main lifts.",
+            "Sleep 7–9 hours and keep protein ~1.6–2.2 g/kg bodyweight.",
+            "Deload 1 week every 6–8 weeks or when fatigue accumulates."
+        ]
+    return tips[:5]
+
+
+def parse_tips(text):
+    """Model output as at most 5 bullet-free lines"""
+    return [line.lstrip('-• ').strip() for line in (text or '').strip().split('\n') if line.strip()][:5]
+
+
+def profile_key(profile: dict) -> str:
+    """Stable hash of the parts of a profile that shape the prompt"""
+    normalized = {
+        'goals': sorted({str(g).strip().lower() for g in profile.get('goals') or []}),
+        'equipment': sorted({str(e).strip().lower() for e in profile.get('equipment') or []}),
+        'schedule': (profile.get('schedule') or '').strip().lower(),
+        'experience_level': (profile.get('experience_level') or '').strip().lower()
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+class StubModel:
+    """Offline stand-in for genai.GenerativeModel with a configurable delay"""
+
+    def __init__(self, latency=None, text=None):
+        self.latency = float(os.getenv('AI_STUB_LATENCY', 0)) if latency is None else latency
+        self.text = text or "\n".join(f"- Stub tip {n}." for n in range(1, 6))
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return SimpleNamespace(text=self.text)
+
+
+def default_model_factory():
+    """The configured model, or None when tips should come from local rules"""
+    if os.getenv('AI_TIPS_MODEL') == 'stub':
+        return StubModel()
+    if not os.getenv('GOOGLE_API_KEY'):
+        return None
+    try:
+        # Imported on first use: the client library is slow to load and unused without a key
+        import google.generativeai as genai
+    except Exception:
+        return None
+    genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+    return genai.GenerativeModel(MODEL_NAME)
+
+
+class TipsService:
+    def __init__(self, model_factory=default_model_factory, timeout=TIPS_TIMEOUT,
+                 cache=None, max_concurrent_calls=MAX_CONCURRENT_CALLS):
+        self.timeout = timeout
+        self.cache = cache or TTLCache(max_entries=CACHE_SIZE, ttl=CACHE_TTL)
+        self._model_factory = model_factory
+        self._model = None
+        self._model_loaded = False
+        self._model_lock = threading.Lock()
+        self._inflight = {}
+        # Reentrant: a call that finishes instantly runs its done-callback while we hold the lock
+        self._inflight_lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_calls, thread_name_prefix='ai-tips')
+
+    @property
+    def model(self):
+        # Built on first use and shared by every request in the process
+        if not self._model_loaded:
+            with self._model_lock:
+                if not self._model_loaded:
+                    self._model = self._model_factory()
+                    self._model_loaded = True
+        return self._model
+
+    def use_model(self, model):
+        """Swap in a model (e.g. StubModel) and drop tips cached from the old one"""
+        with self._model_lock:
+            self._model = model
+            self._model_loaded = True
+        self.cache.clear()
+
+    def get_tips(self, profile: dict):
+        """Tips for the profile: cached, generated within the deadline, or local"""
+        key = profile_key(profile)
+        tips = self.cache.get(key)
+        if tips:
+            return tips
+        if self.model is None:
+            return local_tips(profile)
+
+        try:
+            # On timeout the call keeps running and fills the cache for next time
+            tips = self._flight(key, profile).result(timeout=self.timeout)
+        except Exception:
+            tips = None
+        return tips or local_tips(profile)
+
+    def warm(self, profile: dict):
+        """Generate and cache tips for the profile unless cached; raises if the model fails or hangs"""
+        key = profile_key(profile)
+        if self.model is not None and self.cache.get(key) is None:
+            # A hung call must not hold a job worker; the timeout fails the job so it is retried later
+            if not self._flight(key, profile).result(timeout=WARM_TIMEOUT):
+                raise ValueError('Model returned no tips')
+
+    def _flight(self, key, profile):
+        """The in-flight call for this profile, starting one if none is running"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._generate, key, profile)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._finish(key))
+            return future
+
+    def _finish(self, key):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+
+    def _generate(self, key, profile):
+        with external_call('gemini', 'generate_content'):
+            response = self.model.generate_content(profile_to_prompt(profile))
+        tips = parse_tips(response.text)
+        if tips:
+            self.cache.set(key, tips)
+        return tips
+
+
+tips_service = TipsService()
+
+
+@job('warm_tips')
+def warm_tips(payload):
+    tips_service.warm(payload['profile'])
@@ -0,0 +1,80 @@
+"""
+Cached snapshots of the authenticated user.
+
+Most authenticated routes only need the user's public fields or the
+onboarding profile, not a live ORM object. user_snapshot() returns both as
+plain dicts, looked up first in the request (flask.g), then in a short-TTL
+process cache, and only then in the database.
+
+Commits that write a User row drop that user's entry (see the session hooks
+below), so onboarding and profile changes show up immediately in the worker
+that made them. Other gunicorn workers see them once their entry expires,
+after USER_CACHE_TTL seconds at most.
+"""
+import os
+import threading
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, User
+from ttl_cache import TTLCache
+
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+
+_cache = TTLCache(max_entries=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_lock = threading.Lock()
+_generation = 0  # Bumped on every invalidation, so a load racing a write is not cached
+
+
+def invalidate_user(user_id):
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.pop(int(user_id))
+    snapshots = g.get('user_snapshots') if g else None
+    if snapshots:
+        snapshots.pop(int(user_id), None)
+
+
+def user_snapshot(user_id):
+    """{'user': User.to_dict(), 'profile': User.profile()} or None if there is no such user
+
+    Treat the result as read-only: it is shared with other requests.
+    """
+    user_id = int(user_id)
+    snapshots = g.setdefault('user_snapshots', {})
+    snapshot = snapshots.get(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = _cache.get(user_id)
+    if snapshot is None:
+        generation = _generation
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = {'user': user.to_dict(), 'profile': user.profile()}
+        with _lock:
+            if generation == _generation:
+                _cache.set(user_id, snapshot)
+    snapshots[user_id] = snapshot
+    return snapshot
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_user_writes(session, flush_context):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            session.info.setdefault('users_changed', set()).add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    for user_id in session.info.pop('users_changed', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('users_changed', None)
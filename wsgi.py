@@ -0,0 +1,13 @@
+"""
+WSGI entry point: `gunicorn wsgi:app` (serve.py wraps this with tuned settings).
+
+Building the app does not touch the database; run app.init_db() once per
+deployment (serve.py does it in the gunicorn master) before serving.
+Background job workers start on import, so do not combine this module with
+gunicorn's --preload (serve.py starts them after the fork instead).
+"""
+from app import create_app
+from jobs import worker_pool
+
+app = create_app()
+worker_pool.start(app)